@@ -0,0 +1,116 @@
+"""Local stand-in for the Blockfrost endpoints used by get_wallet_data.
+
+Every address gets a synthetic history, stake key and asset list derived from its
+hash, so benchmark runs are reproducible. Network latency, jitter and the rate of
+429 responses are set on the command line:
+
+    python benchmarks/fake_blockfrost.py --port 18001 --latency-ms 80 --error-rate 0.02
+"""
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+config = argparse.Namespace(latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, max_history=300, max_assets=60, tip_interval=20.0)
+app = FastAPI(title="Fake Blockfrost")
+
+# Synthetic chain starts here; block heights and times grow with each tx index.
+GENESIS_TIME, GENESIS_HEIGHT = 1_700_000_000, 1_000_000
+_started = time.time()
+_stake_owners: dict[str, str] = {}
+_tx_owners: dict[str, tuple[str, int]] = {}
+
+def _seed(value: str) -> int:
+    return int(hashlib.sha256(value.encode()).hexdigest()[:16], 16)
+
+def _tx_hash(address: str, index: int) -> str:
+    return hashlib.sha256(f"{address}:{index}".encode()).hexdigest()
+
+def _history(address: str) -> list[dict]:
+    rng = random.Random(_seed(address))
+    txs, block_time = [], GENESIS_TIME
+    for index in range(20 + _seed(address) % config.max_history):
+        # Mostly hours apart, with the occasional burst of txs a minute apart.
+        block_time += rng.choice([60, 60, 3600, 7200, 86400, 3 * 86400])
+        tx_hash = _tx_hash(address, index)
+        _tx_owners[tx_hash] = (address, index)
+        txs.append({"tx_hash": tx_hash, "tx_index": 0, "block_height": GENESIS_HEIGHT + index * 10, "block_time": block_time})
+    return txs
+
+def _page(items: list, request: Request) -> list:
+    count = int(request.query_params.get("count", 100))
+    page = int(request.query_params.get("page", 1))
+    return items[(page - 1) * count:page * count]
+
+@app.middleware("http")
+async def simulate_network(request: Request, call_next):
+    await asyncio.sleep(max(0.0, config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000)
+    if random.random() < config.error_rate:
+        return JSONResponse({"status_code": 429, "error": "Project Over Limit", "message": "Usage is over limit."}, status_code=429)
+    return await call_next(request)
+
+@app.get("/blocks/latest")
+def latest_block():
+    # The tip moves every tip_interval seconds, like a real chain does every ~20s.
+    epoch = int((time.time() - _started) // config.tip_interval)
+    return {"hash": hashlib.sha256(f"tip:{epoch}".encode()).hexdigest(), "height": GENESIS_HEIGHT * 10 + epoch}
+
+@app.get("/addresses/{address}")
+def address_info(address: str):
+    stake_address = "stake_test1" + hashlib.sha256(address.encode()).hexdigest()[:48]
+    _stake_owners[stake_address] = address
+    return {"address": address, "stake_address": stake_address, "type": "shelley"}
+
+@app.get("/addresses/{address}/transactions")
+def address_transactions(address: str, request: Request):
+    txs = _history(address)
+    if "from" in request.query_params:
+        txs = [tx for tx in txs if tx["block_height"] >= int(request.query_params["from"].split(":")[0])]
+    if request.query_params.get("order") == "desc":
+        txs = txs[::-1]
+    return _page(txs, request)
+
+@app.get("/txs/{tx_hash}/utxos")
+def tx_utxos(tx_hash: str):
+    if tx_hash not in _tx_owners:
+        return JSONResponse({"status_code": 404, "error": "Not Found"}, status_code=404)
+    address, index = _tx_owners[tx_hash]
+    rng = random.Random(_seed(tx_hash))
+    amount = [{"unit": "lovelace", "quantity": str(rng.randint(1, 5000) * 1_000_000)}]
+    own, other = {"address": address, "amount": amount}, {"address": f"addr_test1counterparty{index}", "amount": amount}
+    # Alternate between receiving and sending so flows have both directions.
+    return {"hash": tx_hash, "inputs": [other if index % 2 else own], "outputs": [own if index % 2 else other]}
+
+@app.get("/accounts/{stake_address}")
+def account(stake_address: str):
+    address = _stake_owners.get(stake_address)
+    controlled = sum(_seed(tx["tx_hash"]) % 10_000_000 for tx in _history(address)) if address else 0
+    return {"stake_address": stake_address, "active": True, "controlled_amount": str(controlled)}
+
+@app.get("/accounts/{stake_address}/addresses")
+def account_addresses(stake_address: str, request: Request):
+    address = _stake_owners.get(stake_address)
+    return _page([{"address": address}] if address else [], request)
+
+@app.get("/accounts/{stake_address}/addresses/assets")
+def account_assets(stake_address: str, request: Request):
+    rng = random.Random(_seed(stake_address))
+    policies = [hashlib.sha256(f"{stake_address}:policy:{index}".encode()).hexdigest()[:56] for index in range(1 + rng.randrange(8))]
+    assets = [{"unit": rng.choice(policies) + f"{index:04x}", "quantity": str(rng.choice([1, 1, 1, 1000, 250000]))} for index in range(rng.randrange(config.max_assets))]
+    return _page(assets, request)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=18001)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms, help="Mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms, help="Latency varies uniformly by up to this much")
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="Fraction of requests answered with 429")
+    parser.add_argument("--max-history", type=int, default=config.max_history, help="Histories have 20 to 20 + this many txs")
+    parser.add_argument("--max-assets", type=int, default=config.max_assets, help="Accounts hold up to this many assets")
+    parser.add_argument("--tip-interval", type=float, default=config.tip_interval, help="Seconds between new chain tips")
+    vars(config).update(vars(parser.parse_args()))
+    uvicorn.run(app, host="127.0.0.1", port=config.port, log_level="warning")
@@ -0,0 +1,79 @@
+"""Local stand-in for the OpenAI-compatible chat API that ChatOpenAI talks to.
+
+Answers /v1/chat/completions, streamed or not, with a fixed-length Markdown report.
+Time to first token, generation speed and the rate of 500 responses are set on
+the command line:
+
+    python benchmarks/fake_llm.py --port 18002 --ttft-ms 400 --tokens-per-second 40
+"""
+import time
+import json
+import uuid
+import random
+import asyncio
+import argparse
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+config = argparse.Namespace(ttft_ms=300.0, tokens_per_second=50.0, completion_tokens=150, error_rate=0.0)
+app = FastAPI(title="Fake OpenAI-compatible LLM")
+
+WORDS = "wallet activity shows regular transfers with moderate asset diversity and no unusual bursts".split()
+
+def _completion_tokens(messages: list[dict]) -> list[str]:
+    tokens = [f"{random.choice(WORDS)} " for _ in range(config.completion_tokens)]
+    body = ["### Wallet Profile\n- "] + tokens + ["\n\n### Security Observations\n- Nothing unusual."]
+    # CrewAI agents parse their answer out of a ReAct-style reply.
+    if any("Final Answer:" in str(message.get("content")) for message in messages):
+        body = ["Thought: I now can give a great answer\nFinal Answer: "] + body
+    return body
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    # Roughly four characters per token, which is close enough for load tests.
+    return sum(len(str(message.get("content", ""))) for message in messages) // 4
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    if random.random() < config.error_rate:
+        return JSONResponse({"error": {"message": "Simulated node failure", "type": "server_error"}}, status_code=500)
+    messages, model = payload.get("messages", []), payload.get("model", "fake")
+    tokens, prompt_tokens = _completion_tokens(messages), _prompt_tokens(messages)
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+    completion_id, created = f"chatcmpl-{uuid.uuid4().hex}", int(time.time())
+
+    if not payload.get("stream"):
+        await asyncio.sleep(config.ttft_ms / 1000 + len(tokens) / config.tokens_per_second)
+        message = {"role": "assistant", "content": "".join(tokens)}
+        return {"id": completion_id, "object": "chat.completion", "created": created, "model": model, "choices": [{"index": 0, "message": message, "finish_reason": "stop"}], "usage": usage}
+
+    def chunk(delta: dict, finish_reason=None, **extra) -> str:
+        choices = [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else []
+        return f"data: {json.dumps({'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model, 'choices': choices, **extra})}\n\n"
+
+    async def stream():
+        await asyncio.sleep(config.ttft_ms / 1000)
+        yield chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            yield chunk({"content": token})
+            await asyncio.sleep(1 / config.tokens_per_second)
+        yield chunk({}, finish_reason="stop")
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield chunk(None, usage=usage)
+        yield "data: [DONE]\n\n"
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@app.get("/v1/models")
+def models():
+    return {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "benchmarks"}]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=18002)
+    parser.add_argument("--ttft-ms", type=float, default=config.ttft_ms, help="Delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second, help="Generation speed after the first token")
+    parser.add_argument("--completion-tokens", type=int, default=config.completion_tokens, help="Approximate length of every reply")
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="Fraction of requests answered with 500")
+    vars(config).update(vars(parser.parse_args()))
+    uvicorn.run(app, host="127.0.0.1", port=config.port, log_level="warning")
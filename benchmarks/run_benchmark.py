@@ -0,0 +1,202 @@
+"""Load and latency benchmark for the Veritas API.
+
+Starts the Blockfrost and LLM stand-ins plus a Veritas API pointed at them, drives
+/start_job and /status at a fixed concurrency, and writes throughput and
+p50/p95/p99 latencies (overall and per stage) as JSON for comparing commits:
+
+    python benchmarks/run_benchmark.py --jobs 40 --concurrency 8 --mode fast
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+import httpx
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20, help="Jobs to submit in total")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clients submitting and polling at once")
+    parser.add_argument("--mode", choices=["single", "fast", "duel", "deep"], default="fast")
+    parser.add_argument("--address-pool", type=int, default=0, help="Draw addresses from this many wallets, exercising the caches and job coalescing (0: a new wallet per job with bypass_cache)")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--job-timeout", type=float, default=900, help="Give up on a job after this many seconds")
+    parser.add_argument("--max-concurrent-crews", type=int, default=2, help="MAX_CONCURRENT_CREWS for the API under test")
+    parser.add_argument("--api-url", help="Benchmark an already running API instead of starting one (it must point at the stand-ins itself)")
+    parser.add_argument("--output", help="Result file, defaults to benchmarks/results/<commit>-<time>.json")
+    parser.add_argument("--blockfrost-port", type=int, default=18001)
+    parser.add_argument("--llm-port", type=int, default=18002, help="First LLM stand-in port; further nodes use the following ports")
+    parser.add_argument("--llm-nodes", type=int, default=1, help="LLM stand-ins to start, all routed to via GAIA_NODE_URLS")
+    parser.add_argument("--api-port", type=int, default=18000)
+    parser.add_argument("--blockfrost-latency-ms", type=float, default=50.0)
+    parser.add_argument("--blockfrost-error-rate", type=float, default=0.0)
+    parser.add_argument("--blockfrost-rate-limit", type=float, default=0.0, help="BLOCKFROST_RATE_LIMIT for the API under test (0: no client-side throttle, so the stand-in's latency is what is measured)")
+    parser.add_argument("--llm-ttft-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=150)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    return parser.parse_args()
+
+def start_servers(args, workdir: str) -> tuple[list[subprocess.Popen], str]:
+    """Starts the stand-ins and the API under test; returns the processes and the API URL."""
+    log = open(os.path.join(workdir, "servers.log"), "w")
+    processes = [subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, "fake_blockfrost.py"), "--port", str(args.blockfrost_port), "--latency-ms", str(args.blockfrost_latency_ms), "--error-rate", str(args.blockfrost_error_rate)], stdout=log, stderr=subprocess.STDOUT)]
+    for port in llm_ports(args):
+        processes.append(subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, "fake_llm.py"), "--port", str(port), "--ttft-ms", str(args.llm_ttft_ms), "--tokens-per-second", str(args.llm_tokens_per_second), "--completion-tokens", str(args.llm_completion_tokens), "--error-rate", str(args.llm_error_rate)], stdout=log, stderr=subprocess.STDOUT))
+    if args.api_url:
+        return processes, args.api_url
+    env = {
+        **os.environ,
+        "BLOCKFROST_API_KEY": "benchmark",
+        "BLOCKFROST_API_URL": f"http://127.0.0.1:{args.blockfrost_port}",
+        "BLOCKFROST_RATE_LIMIT": str(args.blockfrost_rate_limit),
+        # GAIA_NODE_URL still configures anything that reads the single node.
+        "GAIA_NODE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+        "GAIA_NODE_URLS": ",".join(f"http://127.0.0.1:{port}/v1" for port in llm_ports(args)),
+        "GAIA_NODE_MODEL": "fake",
+        "GAIA_NODE_API_KEY": "benchmark",
+        "MAX_CONCURRENT_CREWS": str(args.max_concurrent_crews),
+        "MAX_QUEUED_JOBS": str(args.jobs),
+    }
+    # The API runs in the scratch directory, so its caches, job store and logs start empty.
+    processes.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", REPO_DIR, "--port", str(args.api_port), "--log-level", "warning"], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT))
+    return processes, f"http://127.0.0.1:{args.api_port}"
+
+def llm_ports(args) -> range:
+    return range(args.llm_port, args.llm_port + args.llm_nodes)
+
+def wait_until_up(urls: list[str], timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                httpx.get(url, timeout=2)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+                time.sleep(0.2)
+
+def job_input(args, index: int) -> dict:
+    wallet = index % args.address_pool if args.address_pool else index
+    address = f"addr_test1benchmark{wallet:06d}"
+    input_data = {"wallet_address_1": address, "bypass_cache": not args.address_pool}
+    if args.mode == "duel":
+        input_data["wallet_address_2"] = f"{address}peer"
+    input_data["fast_mode"] = args.mode == "fast"
+    input_data["deep_mode"] = args.mode == "deep"
+    return {"input_data": input_data}
+
+def run_job(client: httpx.Client, args, index: int) -> dict:
+    submitted = time.monotonic()
+    while True:
+        response = client.post("/start_job", json=job_input(args, index))
+        if response.status_code != 429:
+            break
+        time.sleep(float(response.headers.get("Retry-After", "1")))
+    response.raise_for_status()
+    job = response.json()
+    while job["status"] not in TERMINAL_STATUSES:
+        if time.monotonic() - submitted > args.job_timeout:
+            return {"status": "timeout", "latency": time.monotonic() - submitted, "timings": None}
+        time.sleep(args.poll_interval)
+        job = client.get("/status", params={"job_id": job["job_id"]}).json()
+    return {"status": job["status"], "latency": time.monotonic() - submitted, "timings": job.get("timings")}
+
+def drive(args, api_url: str) -> tuple[list[dict], float]:
+    results, next_index, lock = [], iter(range(args.jobs)), threading.Lock()
+
+    def client_loop():
+        with httpx.Client(base_url=api_url, timeout=30) as client:
+            while True:
+                with lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                try:
+                    result = run_job(client, args, index)
+                except httpx.HTTPError as e:
+                    result = {"status": "error", "error": str(e), "latency": None, "timings": None}
+                with lock:
+                    results.append(result)
+
+    started = time.monotonic()
+    clients = [threading.Thread(target=client_loop) for _ in range(args.concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    return results, time.monotonic() - started
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    array = np.asarray(values, dtype=float)
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {"count": int(array.size), "mean": round(float(array.mean()), 3), "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3), "max": round(float(array.max()), 3)}
+
+def summarize(args, results: list[dict], wall_seconds: float) -> dict:
+    finished = [result for result in results if result["latency"] is not None and result["status"] == "completed"]
+    timings = [result["timings"] for result in finished if result["timings"]]
+    statuses = {}
+    for result in results:
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    return {
+        "commit": git_commit(),
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "jobs": statuses,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_jobs_per_minute": round(len(finished) / wall_seconds * 60, 3) if wall_seconds else None,
+        "latency_seconds": percentiles([result["latency"] for result in finished]),
+        "queue_wait_seconds": percentiles([t["queue_wait"] for t in timings if t.get("queue_wait") is not None]),
+        "stage_seconds": per_job(timings, "stages"),
+        "llm_seconds_per_job": per_job(timings, "llm"),
+        "blockfrost_seconds_per_job": per_job(timings, "blockfrost"),
+    }
+
+def per_job(timings: list[dict], section: str) -> dict:
+    """Percentiles of each job's seconds per stage, LLM stage or Blockfrost endpoint."""
+    values = {}
+    for job_timings in timings:
+        for name, entry in job_timings[section].items():
+            values.setdefault(name, []).append(entry["seconds"] if isinstance(entry, dict) else entry)
+    return {name: percentiles(seconds) for name, seconds in sorted(values.items())}
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="veritas-bench-") as workdir:
+        processes, api_url = start_servers(args, workdir)
+        try:
+            wait_until_up([f"http://127.0.0.1:{args.blockfrost_port}/blocks/latest", *(f"http://127.0.0.1:{port}/v1/models" for port in llm_ports(args)), f"{api_url}/docs"])
+            results, wall_seconds = drive(args, api_url)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+    report = summarize(args, results, wall_seconds)
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"{(report['commit'] or 'unknown')[:8]}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Wrote {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
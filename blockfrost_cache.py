@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, Counter
+from dataclasses import dataclass
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_ENABLED = os.environ.get("BLOCKFROST_CACHE_ENABLED", "true").lower() != "false"
+CACHE_PATH = os.environ.get("BLOCKFROST_CACHE_PATH", os.path.join("data", "blockfrost_cache.sqlite3"))
+MEMORY_ENTRIES = int(os.environ.get("BLOCKFROST_CACHE_MEMORY_ENTRIES", "1024"))
+# The SQLite file keeps at most this many entries, dropping the least recently stored.
+DISK_ENTRIES = int(os.environ.get("BLOCKFROST_CACHE_DISK_ENTRIES", "200000"))
+# Expired and excess rows are purged once every this many writes.
+CLEANUP_EVERY_WRITES = 1000
+
+# Address -> stake key never changes, so stake lookups carry no TTL. History and
+# asset entries are also revalidated against the chain tip, the TTL only caps
+# how long we trust an entry whose address hasn't moved.
+HISTORY_TTL = float(os.environ.get("BLOCKFROST_CACHE_HISTORY_TTL", "3600"))
+ASSETS_TTL = float(os.environ.get("BLOCKFROST_CACHE_ASSETS_TTL", "600"))
+# Cardano produces a block roughly every 20 seconds.
+TIP_TTL = float(os.environ.get("BLOCKFROST_CACHE_TIP_TTL", "20"))
+
+@dataclass
+class CacheEntry:
+    value: object
+    expires_at: float | None = None
+    tip: str | None = None
+    version: str | None = None
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= time.time()
+
+class BlockfrostCache:
+    """Two-level cache for Blockfrost responses: a memory LRU over a SQLite file.
+
+    Entries are keyed by network, endpoint and address, and remember the chain tip
+    they were fetched at plus a caller-defined version (the address's latest tx hash).
+    """
+    def __init__(self, path: str = CACHE_PATH, memory_entries: int = MEMORY_ENTRIES, disk_entries: int = DISK_ENTRIES):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._writes = 0
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, tip TEXT, version TEXT)")
+        if "stored_at" not in {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}:
+            self._db.execute("ALTER TABLE entries ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at)")
+        with self._lock:
+            self._cleanup()
+
+    @staticmethod
+    def make_key(network: str, endpoint: str, address: str) -> str:
+        return f"{network}:{endpoint}:{address}"
+
+    def get(self, network: str, endpoint: str, address: str) -> CacheEntry | None:
+        key = self.make_key(network, endpoint, address)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                source = "memory"
+            else:
+                row = self._db.execute("SELECT value, expires_at, tip, version FROM entries WHERE key = ?", (key,)).fetchone()
+                entry = CacheEntry(json.loads(row[0]), *row[1:]) if row else None
+                if entry is not None:
+                    self._remember(key, entry)
+                source = "disk"
+            if entry is None or entry.expired():
+                self._stats[f"{endpoint}.miss"] += 1
+                return None
+            self._stats[f"{endpoint}.{source}_hit"] += 1
+            return entry
+
+    def set(self, network: str, endpoint: str, address: str, value, ttl: float | None = None, tip: str | None = None, version: str | None = None):
+        entry = CacheEntry(value, time.time() + ttl if ttl is not None else None, tip, version)
+        self._put(self.make_key(network, endpoint, address), entry)
+
+    def restamp(self, network: str, endpoint: str, address: str, entry: CacheEntry, tip: str):
+        """Marks an entry as still valid at a newer chain tip."""
+        self._put(self.make_key(network, endpoint, address), CacheEntry(entry.value, entry.expires_at, tip, entry.version))
+        self._stats[f"{endpoint}.revalidated"] += 1
+
+    def record_stale(self, endpoint: str):
+        """Counts a hit that had to be refetched because the chain moved."""
+        self._stats[f"{endpoint}.stale"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {"memory_entries": len(self._memory), "memory_capacity": self.memory_entries, "disk_entries": disk_entries, "disk_capacity": self.disk_entries, "counters": dict(self._stats)}
+
+    def _put(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute("INSERT OR REPLACE INTO entries (key, value, expires_at, tip, version, stored_at) VALUES (?, ?, ?, ?, ?, ?)", (key, json.dumps(entry.value), entry.expires_at, entry.tip, entry.version, time.time()))
+            self._writes += 1
+            if self._writes % CLEANUP_EVERY_WRITES == 0:
+                self._cleanup()
+
+    def _cleanup(self):
+        # Entries without a TTL (tx UTxOs, stake keys) only leave through the size cap.
+        self._db.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        self._db.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)", (self.disk_entries,))
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+_cache: BlockfrostCache | None = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> BlockfrostCache | None:
+    """Returns the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = BlockfrostCache()
+        return _cache
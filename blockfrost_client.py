@@ -0,0 +1,186 @@
+import os
+import asyncio
+import threading
+import random
+import time
+import httpx
+from logging_config import get_logger
+from metrics import observe_blockfrost
+
+logger = get_logger(__name__)
+
+BLOCKFROST_API_KEY = os.environ.get("BLOCKFROST_API_KEY")
+CARDANO_NETWORK = os.environ.get("CARDANO_NETWORK", "preprod")
+# Overridable so benchmarks (and self-hosted Blockfrost) can point elsewhere.
+BLOCKFROST_API_URL = os.environ.get("BLOCKFROST_API_URL", f"https://cardano-{CARDANO_NETWORK}.blockfrost.io/api/v0")
+
+# Blockfrost allows 10 req/s with a burst of 500, so a modest pool is enough to
+# keep every independent call of every running job in flight at once.
+MAX_CONNECTIONS = int(os.environ.get("BLOCKFROST_MAX_CONNECTIONS", "20"))
+# Requests are paced to those limits rather than relying on 429s. They apply per
+# project, so with several API processes divide the rate between them (0 disables).
+RATE_LIMIT = float(os.environ.get("BLOCKFROST_RATE_LIMIT", "10"))
+RATE_BURST = int(os.environ.get("BLOCKFROST_RATE_BURST", "500"))
+MAX_RETRIES = int(os.environ.get("BLOCKFROST_MAX_RETRIES", "4"))
+REQUEST_TIMEOUT = float(os.environ.get("BLOCKFROST_TIMEOUT", "30"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Blockfrost's maximum page size; deep fetches request this many pages at once.
+PAGE_SIZE = 100
+PAGE_CONCURRENCY = int(os.environ.get("BLOCKFROST_PAGE_CONCURRENCY", "5"))
+
+class BlockfrostError(Exception):
+    """Raised when Blockfrost answers with a non-success status."""
+    def __init__(self, status_code: int, path: str):
+        super().__init__(f"Blockfrost returned status {status_code} for {path}")
+        self.status_code = status_code
+        self.path = path
+
+class TokenBucket:
+    """Paces async callers to `rate` acquisitions per second, allowing bursts of up to `burst`."""
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # Waiters queue on the lock, so they are let through in arrival order.
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+class BlockfrostClient:
+    """Connection-pooled, rate-limited async client for the Blockfrost API with 429 backoff."""
+    def __init__(self, api_key: str | None = BLOCKFROST_API_KEY, base_url: str = BLOCKFROST_API_URL, max_connections: int = MAX_CONNECTIONS, max_retries: int = MAX_RETRIES, rate_limit: float = RATE_LIMIT, rate_burst: int = RATE_BURST):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        # Shared by every job using this client; retries count against it too.
+        self._limiter = TokenBucket(rate_limit, rate_burst) if rate_limit > 0 else None
+        self._client: httpx.AsyncClient | None = None
+        self._tip: tuple[float, str] | None = None
+        self._tip_request: asyncio.Future | None = None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the loop that actually uses it.
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(base_url=self.base_url, headers={"project_id": self.api_key or ""}, limits=limits, timeout=REQUEST_TIMEOUT)
+        return self._client
+
+    async def get(self, path: str, params: dict | None = None):
+        """GETs a Blockfrost path and returns the decoded JSON, retrying on 429/5xx."""
+        client = self._get_http_client()
+        started = time.monotonic()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if self._limiter is not None:
+                    await self._limiter.acquire()
+                response = await client.get(path, params=params)
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise BlockfrostError(response.status_code, path)
+                delay = _retry_delay(response, attempt)
+                logger.warning(f"Blockfrost {response.status_code} for {path}, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+        finally:
+            observe_blockfrost(path, time.monotonic() - started)
+
+    async def get_all_pages(self, path: str, params: dict | None = None, page_size: int = PAGE_SIZE, concurrency: int | None = None, on_page=None) -> list:
+        """Fetches every page of a paginated endpoint, `concurrency` pages at a time.
+
+        Pages are requested speculatively in batches and the walk stops at the first
+        short page. on_page(page_number, items), if given, sees each page in order
+        instead of the pages being collected, so callers can persist progress without
+        the whole result in memory; the return value is then an empty list.
+        """
+        concurrency = concurrency or PAGE_CONCURRENCY
+        items, first_page = [], 1
+        while True:
+            pages = range(first_page, first_page + concurrency)
+            batch = await asyncio.gather(*(self.get(path, params={**(params or {}), "count": page_size, "page": page}) for page in pages))
+            for page, page_items in zip(pages, batch):
+                if on_page is not None:
+                    on_page(page, page_items)
+                else:
+                    items.extend(page_items)
+                if len(page_items) < page_size:
+                    return items
+            first_page += concurrency
+
+    async def chain_tip(self, max_age: float) -> str:
+        """Returns the latest block hash, shared by all callers for up to max_age seconds."""
+        if self._tip is not None and time.monotonic() - self._tip[0] < max_age:
+            return self._tip[1]
+        # Concurrent jobs piggyback on a single in-flight /blocks/latest request.
+        if self._tip_request is None:
+            self._tip_request = asyncio.ensure_future(self.get("/blocks/latest"))
+        request = self._tip_request
+        try:
+            block = await asyncio.shield(request)
+        finally:
+            if self._tip_request is request and request.done():
+                self._tip_request = None
+        self._tip = (time.monotonic(), block["hash"])
+        return block["hash"]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    # Exponential backoff with full jitter so concurrent jobs don't retry in lockstep.
+    return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+# --- Shared event loop ---
+# Jobs run on worker threads, so a single background loop owns the client and
+# its connection pool; synchronous callers submit coroutines to it.
+_loop: asyncio.AbstractEventLoop | None = None
+_client: BlockfrostClient | None = None
+_lock = threading.Lock()
+
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="blockfrost-loop", daemon=True).start()
+        return _loop
+
+def get_client() -> BlockfrostClient:
+    """Returns the process-wide Blockfrost client."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = BlockfrostClient()
+        return _client
+
+def run_sync(coro):
+    """Runs a coroutine on the shared Blockfrost loop and blocks until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _ensure_loop()).result()
+
+def shutdown():
+    """Closes the shared client's connections; safe to call if nothing was started."""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None and _loop is not None:
+        asyncio.run_coroutine_threadsafe(client.aclose(), _loop).result()
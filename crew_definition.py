@@ -1,75 +1,308 @@
 # --- START OF CORRECTED crew_definition.py ---
 
 import os
-import requests
+import asyncio
 import json
 from crewai import Agent, Task, Crew, Process
-from langchain_openai import ChatOpenAI
-import io
-import contextlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pydantic import BaseModel
+import contextvars
+from logging_config import JobLogCapture, get_logger
+from metrics import current_timings
+from llm_router import RoutedLLM, get_router
+from blockfrost_client import BLOCKFROST_API_KEY, CARDANO_NETWORK, BlockfrostError, get_client, run_sync
+from blockfrost_cache import ASSETS_TTL, HISTORY_TTL, TIP_TTL, get_cache
+from report_cache import get_report_cache, make_report_key
+from wallet_features import block_times_of, compact_features, compute_wallet_features, with_recency
+from wallet_indexer import get_indexer
+
+logger = get_logger(__name__)
 
 os.environ["OPENAI_API_KEY"] = os.environ.get("GAIA_NODE_API_KEY", "dummy_key")
 os.environ["OPENAI_API_BASE"] = os.environ.get("GAIA_NODE_URL", "http://localhost:8080/v1")
 os.environ["OPENAI_MODEL_NAME"] = os.environ.get("GAIA_NODE_MODEL", "openai/gpt-4")
 
-BLOCKFROST_API_KEY = os.environ.get("BLOCKFROST_API_KEY")
-CARDANO_NETWORK = os.environ.get("CARDANO_NETWORK", "preprod")
-BLOCKFROST_API_URL = f"https://cardano-{CARDANO_NETWORK}.blockfrost.io/api/v0"
-
-def get_wallet_data(wallet_address: str) -> str:
-    if not BLOCKFROST_API_KEY: return json.dumps({"error": "Server configuration error: BLOCKFROST_API_KEY is not set."})
-    headers = {"project_id": BLOCKFROST_API_KEY}
-    data_summary = {}
-    TRANSACTION_COUNT, ASSET_COUNT = 10, 15
-    print(f"\n--- [Veritas AI Debug] Starting MINIMAL data fetch for {wallet_address} ---")
-    try:
-        address_info_url = f"{BLOCKFROST_API_URL}/addresses/{wallet_address}"
-        addr_response = requests.get(address_info_url, headers=headers)
-        if addr_response.status_code != 200: return json.dumps({"error": f"Failed to get address info (Status: {addr_response.status_code}). Is the address on '{CARDANO_NETWORK}'?"})
-        stake_address = addr_response.json().get('stake_address')
-        tx_history_url = f"{BLOCKFROST_API_URL}/addresses/{wallet_address}/transactions?order=desc&count={TRANSACTION_COUNT}"
-        tx_response = requests.get(tx_history_url, headers=headers)
-        tx_response.raise_for_status()
-        data_summary['recent_transaction_hashes'] = [tx['tx_hash'] for tx in tx_response.json()]
-        if stake_address:
-            assets_url = f"{BLOCKFROST_API_URL}/accounts/{stake_address}/addresses/assets"
-            assets_response = requests.get(assets_url, headers=headers)
-            assets_response.raise_for_status()
-            assets_data = assets_response.json()
-            data_summary['assets_held'] = [asset['unit'] for asset in assets_data[:ASSET_COUNT]]
-            data_summary['total_asset_classes'] = len(assets_data)
-        else:
-            data_summary.update(assets_held=[], total_asset_classes=0)
-        return json.dumps(data_summary, indent=2)
-    except Exception as e:
-        return json.dumps({"error": f"An unexpected error during data fetch: {e}"})
+# The agents only see computed features, so a full page of history is cheap to
+# include; ADA flows need one /txs/{hash}/utxos call each, so they use fewer.
+TRANSACTION_COUNT, FLOW_TX_COUNT = 100, 20
+# Bump whenever an agent, task or prompt changes so cached reports are not reused.
+PROMPT_VERSION = "3"
+# crewAI agents without function calling reply "Thought: ...\nFinal Answer: <answer>".
+REACT_ANSWER_MARKER = "Final Answer:"
+# Batch jobs: wallets per request, and how many per-wallet profiles run at once.
+MAX_BATCH_WALLETS = int(os.environ.get("MAX_BATCH_WALLETS", "50"))
+BATCH_PROFILE_CONCURRENCY = int(os.environ.get("BATCH_PROFILE_CONCURRENCY", "2"))
+
+async def resolve_stake_address(wallet_address: str) -> str | None:
+    """Returns the stake key an address belongs to; the mapping is cached forever."""
+    client, cache = get_client(), get_cache()
+    entry = cache and cache.get(CARDANO_NETWORK, "stake_address", wallet_address)
+    if entry:
+        return entry.value
+    address_info = await client.get(f"/addresses/{wallet_address}")
+    stake_address = address_info.get('stake_address')
+    if cache: cache.set(CARDANO_NETWORK, "stake_address", wallet_address, stake_address)
+    return stake_address
+
+async def fetch_wallet_data(wallet_address: str, deep: bool = False) -> dict:
+    """Fetches one address's on-chain data and reduces it to a feature summary.
+
+    The tx-history call (followed by the per-tx UTxO lookups) runs alongside the
+    address -> stake -> assets chain, so the fetch costs two round-trips of depth.
+    Responses are served from the Blockfrost cache while the chain tip (or the
+    address's latest tx hash) is unchanged. In deep mode the features cover the
+    address's full history, synced incrementally into the local wallet index, and
+    every page of held assets.
+    """
+    if not BLOCKFROST_API_KEY: return {"error": "Server configuration error: BLOCKFROST_API_KEY is not set."}
+    client, cache = get_client(), get_cache()
+    logger.info(f"Fetching {'the full' if deep else 'recent'} history, tx UTxOs and assets for {wallet_address}")
+
+    async def fetch_history():
+        entry = cache and cache.get(CARDANO_NETWORK, "transactions", wallet_address)
+        path = f"/addresses/{wallet_address}/transactions"
+        if entry:
+            tip = await client.chain_tip(TIP_TTL)
+            if entry.tip == tip:
+                return entry.value
+            # The chain moved on, but if this address's latest tx is unchanged, so is its history.
+            if entry.version == _latest_tx_hash(await client.get(path, params={"order": "desc", "count": 1})):
+                cache.restamp(CARDANO_NETWORK, "transactions", wallet_address, entry, tip)
+                return entry.value
+            cache.record_stale("transactions")
+        if not cache:
+            return await client.get(path, params={"order": "desc", "count": TRANSACTION_COUNT})
+        history, tip = await asyncio.gather(client.get(path, params={"order": "desc", "count": TRANSACTION_COUNT}), client.chain_tip(TIP_TTL))
+        cache.set(CARDANO_NETWORK, "transactions", wallet_address, history, ttl=HISTORY_TTL, tip=tip, version=_latest_tx_hash(history))
+        return history
+
+    async def fetch_indexed_history():
+        indexer = get_indexer()
+        await indexer.sync(client, CARDANO_NETWORK, wallet_address)
+        return [{'tx_hash': tx_hash} for tx_hash in indexer.latest_tx_hashes(CARDANO_NETWORK, wallet_address, FLOW_TX_COUNT)]
+
+    history_task = asyncio.ensure_future(fetch_indexed_history() if deep else fetch_history())
+    assets_endpoint = "assets_all" if deep else "assets"
+
+    async def fetch_assets():
+        stake_address = await resolve_stake_address(wallet_address)
+        if not stake_address:
+            return []
+        entry = cache and cache.get(CARDANO_NETWORK, assets_endpoint, stake_address)
+        if entry:
+            tip = await client.chain_tip(TIP_TTL)
+            if entry.tip == tip:
+                return entry.value
+            # The chain moved on, but if no address of this stake key has transacted since, keep the entry.
+            if entry.version == await _account_version(client, stake_address):
+                cache.restamp(CARDANO_NETWORK, assets_endpoint, stake_address, entry, tip)
+                return entry.value
+            cache.record_stale(assets_endpoint)
+        assets_path = f"/accounts/{stake_address}/addresses/assets"
+        if not cache:
+            return await (client.get_all_pages(assets_path) if deep else client.get(assets_path))
+        assets, tip, version = await asyncio.gather(client.get_all_pages(assets_path) if deep else client.get(assets_path), client.chain_tip(TIP_TTL), _account_version(client, stake_address))
+        cache.set(CARDANO_NETWORK, assets_endpoint, stake_address, assets, ttl=ASSETS_TTL, tip=tip, version=version)
+        return assets
+
+    async def fetch_tx_utxos(tx_hash: str):
+        # Confirmed transactions never change, so these entries carry no TTL.
+        entry = cache and cache.get(CARDANO_NETWORK, "tx_utxos", tx_hash)
+        if entry:
+            return entry.value
+        utxos = await client.get(f"/txs/{tx_hash}/utxos")
+        if cache: cache.set(CARDANO_NETWORK, "tx_utxos", tx_hash, utxos)
+        return utxos
+
+    async def fetch_flows():
+        history = await history_task
+        return await asyncio.gather(*(fetch_tx_utxos(tx['tx_hash']) for tx in history[:FLOW_TX_COUNT]))
+
+    results = await asyncio.gather(fetch_assets(), history_task, fetch_flows(), return_exceptions=True)
+    # The address lookup failing is the most useful thing to report, so check it first.
+    for result in results:
+        if isinstance(result, BlockfrostError) and result.path == f"/addresses/{wallet_address}":
+            return {"error": f"Failed to get address info (Status: {result.status_code}). Is the address on '{CARDANO_NETWORK}'?"}
+    for result in results:
+        if isinstance(result, Exception):
+            return {"error": f"An unexpected error during data fetch: {result}"}
+    assets_result, history_result, flows_result = results
+    block_times = get_indexer().block_times(CARDANO_NETWORK, wallet_address) if deep else block_times_of(history_result)
+    return compute_wallet_features(wallet_address, block_times, assets_result, flows_result)
+
+def _latest_tx_hash(history: list) -> str | None:
+    return history[0]['tx_hash'] if history else None
+
+async def _account_version(client, stake_address: str) -> str | None:
+    # Assets are cached per stake key, so they are versioned by the whole account rather
+    # than one address. Any tx touching any of its addresses moves at least fees or
+    # min-ADA, so the controlled lovelace changes whenever the holdings can have.
+    account = await client.get(f"/accounts/{stake_address}")
+    return str(account.get('controlled_amount'))
+
+def get_wallet_data(wallet_address: str, deep: bool = False) -> str:
+    return get_wallets_data(wallet_address, deep=deep)[0]
+
+def get_wallets_data(*wallet_addresses: str, deep: bool = False) -> list[str]:
+    """Fetches several wallets concurrently over the shared Blockfrost pool."""
+    async def fetch_all():
+        return await asyncio.gather(*(fetch_wallet_data(address, deep=deep) for address in wallet_addresses))
+    return [json.dumps(data, indent=2) for data in run_sync(fetch_all())]
+
+def dedupe_by_stake(wallet_addresses: list[str]) -> tuple[list[str], dict[str, list[str]]]:
+    """Collapses addresses that share a stake key, since they share the same assets.
+
+    Returns the first address seen for each stake key (in input order) and, for
+    each of those, the other addresses that were folded into it. Addresses without
+    a stake key, or whose lookup fails, are kept as they are.
+    """
+    wallet_addresses = list(dict.fromkeys(wallet_addresses))
+    async def resolve_all():
+        return await asyncio.gather(*(resolve_stake_address(address) for address in wallet_addresses), return_exceptions=True)
+    representatives, merged, by_stake = [], {}, {}
+    for address, stake_address in zip(wallet_addresses, run_sync(resolve_all())):
+        if isinstance(stake_address, str):
+            if stake_address in by_stake:
+                merged[by_stake[stake_address]].append(address)
+                continue
+            by_stake[stake_address] = address
+        representatives.append(address)
+        merged[address] = []
+    return representatives, merged
+
+class Result(BaseModel):
+    raw: str
+
+# Shared by the three-agent crew and fast mode, so both produce the same sections.
+ANALYST_PERSONA = dict(role='Expert Crypto Wallet Analyst', goal='Analyze collected on-chain data to create a clear, bullet-point summary of the wallet\'s profile.', backstory="You are a succinct on-chain analyst who turns raw data into simple insights for non-technical users.")
+SECURITY_PERSONA = dict(role='On-Chain Security Heuristics Analyst', goal='Scan wallet data for potential red flags or unusual activity patterns based on a set of heuristics.', backstory="You are a security-conscious on-chain analyst. You find patterns that are worth a second look.")
+PROFILE_INSTRUCTIONS = "Create a brief, bullet-point summary under the heading '### Wallet Profile'. Answer:\n- **Primary Activity:** Transactions or collecting assets? Use the 'activity' and 'ada_flows' figures.\n- **Asset Diversity:** Comment on the number of different assets and policies held.\n- **Wallet Persona:** In one short sentence, what is this wallet's likely persona?"
+SECURITY_INSTRUCTIONS = "Create your analysis as a bullet-point list under the heading '### Security Observations'. Consider:\n- **Token Dust:** 'assets.lone_unit_ratio' is the share of asset classes held as one unit with nothing else from their policy. Airdropped spam looks like that, but so does any one-off NFT. Together with 'assets.total_asset_classes', does it suggest unsolicited tokens?\n- **Transaction Velocity:** Do the 'activity' window counts, interval statistics and 'bursts' show unusually rapid activity?\n- **Overall Risk Profile:** Provide a one-sentence summary."
+
+def make_llm(progress=None, answer_marker: str | None = None) -> RoutedLLM:
+    """Builds an LLM over the Gaia node pool, streaming tokens (after answer_marker, if given) to progress."""
+    return RoutedLLM(get_router(), os.environ["OPENAI_MODEL_NAME"], on_token=progress.token if progress else None, answer_marker=answer_marker)
+
+def prompt_data(raw_data: str) -> str:
+    """Adds the figures that depend on the current time to fetched wallet data, just before an agent sees it."""
+    return json.dumps(with_recency(json.loads(raw_data)), indent=2)
+
+def mark_stage(progress, name: str):
+    """Moves a job to its next stage, for both its progress stream and its timings."""
+    if progress is None:
+        return
+    progress.stage(name)
+    timings = current_timings()
+    if timings is not None:
+        timings.stage(name)
+
+def crew_log_callbacks(log_capture: JobLogCapture) -> dict:
+    """Crew step and task callbacks that write the agents' reasoning and task outputs to a job's log.
+
+    crewAI 1.x prints its verbose output from event-bus worker threads, outside the
+    job's context, so crews run quietly and their log is fed from these callbacks.
+    """
+    def on_step(step):
+        log_capture.write(f"{getattr(step, 'text', step)}\n")
+        if getattr(step, "result", None):
+            log_capture.write(f"Observation: {step.result}\n")
+
+    def on_task(output):
+        log_capture.write(f"--- [Veritas AI] Task completed by {output.agent} ---\n{output.raw}\n")
+    return {"step_callback": on_step, "task_callback": on_task}
+
+def build_comparison_crew(llm: RoutedLLM, labeled_data: list[tuple[str, str]], log_capture: JobLogCapture, callback=None) -> Crew:
+    """Builds the single-agent crew comparing two wallets (a duel) or more (a portfolio)."""
+    combined_data = "\n\n".join(f"--- {label} Data ---\n{raw_data}" for label, raw_data in labeled_data)
+    if len(labeled_data) == 2:
+        heading, subject, goal_subject = "Wallet Duel Analysis", "two wallets", "two different Cardano wallets"
+        questions = "- **Primary Activity:** How do their primary activities compare?\n- **Asset Diversity:** Which wallet holds more diverse assets?\n- **Activity Level:** Which wallet appears more active?\n- **Overall Comparison:** What is the key difference or similarity between them?"
+    else:
+        heading, subject, goal_subject = "Portfolio Comparison", f"{len(labeled_data)} wallets", "a group of Cardano wallets"
+        questions = "- **Primary Activity:** Group the wallets by their primary activity.\n- **Asset Diversity:** Which wallets hold the most and the least diverse assets?\n- **Activity Level:** Which wallets are the most and the least active?\n- **Outliers:** Which wallets stand out, e.g. bursts, a high lone-unit ratio or large outflows?\n- **Overall Comparison:** What does the group look like as a whole?"
+    comparative_analyst = Agent(role='Expert Comparative On-Chain Analyst', goal=f'Analyze and compare the on-chain data from {goal_subject}.', backstory="You are an expert in on-chain forensics, specializing in comparing wallet behaviors.", verbose=False, allow_delegation=False, llm=llm)
+    comparison_task = Task(description=f"Analyze the provided JSON data for {subject} and create a comparative report in Markdown format under the heading '### {heading}'.\n\n{combined_data}\n\nAnswer the following:\n{questions}", expected_output=f"A concise, Markdown-formatted, bullet-point summary under the heading '### {heading}'.", agent=comparative_analyst, callback=callback)
+    return Crew(agents=[comparative_analyst], tasks=[comparison_task], process=Process.sequential, verbose=False, **crew_log_callbacks(log_capture))
 
 class WalletProfilingCrew:
-    def __init__(self, wallet_address_1: str, wallet_address_2: str | None = None):
+    """Profiles one wallet, or compares two.
+
+    progress, if given, receives stage(name) calls as the pipeline moves between
+    fetching and each agent, and token(text) calls as the LLM streams its output.
+    job_id labels the agents' captured log lines in the log file. fast_mode swaps the
+    single-wallet crew for two parallel LLM calls whose sections are joined in code.
+    deep_mode analyzes each wallet's full indexed history instead of its latest page.
+    wallet_data skips the fetch when the caller already has get_wallets_data output.
+    """
+    def __init__(self, wallet_address_1: str, wallet_address_2: str | None = None, progress=None, job_id: str | None = None, fast_mode: bool = False, deep_mode: bool = False, wallet_data: list[str] | None = None):
         self.wallet_address_1 = wallet_address_1
         self.wallet_address_2 = wallet_address_2
-        self.llm = ChatOpenAI(model=os.environ["OPENAI_MODEL_NAME"], base_url=os.environ["OPENAI_API_BASE"], request_timeout=120)
+        self.job_id = job_id or wallet_address_1
+        self.fast_mode = fast_mode
+        self.deep_mode = deep_mode
+        self.progress = progress
+        # Crew agents answer in ReAct form, so only their final answers are streamed.
+        self.llm = make_llm(progress, answer_marker=REACT_ANSWER_MARKER)
+        self._wallet_data = wallet_data
+
+    @property
+    def mode(self) -> str:
+        if self.wallet_address_2:
+            return "duel"
+        return "fast" if self.fast_mode else "single"
+
+    @property
+    def job_kind(self) -> str:
+        """The mode plus data depth; jobs of one kind share a report-cache namespace and timing."""
+        return f"{self.mode}-deep" if self.deep_mode else self.mode
+
+    def _addresses(self) -> list[str]:
+        return [address for address in (self.wallet_address_1, self.wallet_address_2) if address]
+
+    def get_data(self) -> list[str]:
+        """Fetches the raw data for every wallet in this job, once."""
+        if self._wallet_data is None:
+            self._wallet_data = get_wallets_data(*self._addresses(), deep=self.deep_mode)
+        return self._wallet_data
+
+    def report_cache_key(self) -> str | None:
+        """Keys the report on the wallet data it would be built from; None if the fetch failed."""
+        try:
+            wallet_data = [json.loads(raw_data) for raw_data in self.get_data()]
+        except json.JSONDecodeError:
+            return None
+        if any('error' in data for data in wallet_data):
+            return None
+        return make_report_key(self.job_kind, wallet_data, os.environ["OPENAI_MODEL_NAME"], PROMPT_VERSION)
+
+    def cached_report(self) -> tuple[str, float] | None:
+        """Returns (report, created_at) if these wallets were analyzed unchanged before."""
+        # A first deep fetch is a full-history sync; leave that to the worker, not the caller.
+        if self.deep_mode and not all(get_indexer().is_indexed(CARDANO_NETWORK, address) for address in self._addresses()):
+            return None
+        key = self.report_cache_key()
+        return get_report_cache().get(key) if key else None
+
+    def _stage(self, name: str):
+        mark_stage(self.progress, name)
 
     def run(self):
-        from pydantic import BaseModel
-        class Result(BaseModel):
-            raw: str
+        self._stage("fetching")
+        log_capture = JobLogCapture(self.job_id)
 
         # --- DUAL WALLET ANALYSIS MODE ---
         if self.wallet_address_2:
-            raw_data_1 = get_wallet_data(self.wallet_address_1)
-            raw_data_2 = get_wallet_data(self.wallet_address_2)
+            raw_data_1, raw_data_2 = self.get_data()
             data1_json = json.loads(raw_data_1); data2_json = json.loads(raw_data_2)
             if 'error' in data1_json or 'error' in data2_json:
                 error_message = f"Could not generate comparison. Wallet 1 error: {data1_json.get('error', 'None')}, Wallet 2 error: {data2_json.get('error', 'None')}"
                 return {"result": Result(raw=error_message), "log": error_message}
-            combined_data = f"--- Wallet 1 Data ---\n{raw_data_1}\n\n--- Wallet 2 Data ---\n{raw_data_2}"
-            comparative_analyst = Agent(role='Expert Comparative On-Chain Analyst', goal='Analyze and compare the on-chain data from two different Cardano wallets.', backstory="You are an expert in on-chain forensics, specializing in comparing wallet behaviors.", verbose=True, allow_delegation=False, llm=self.llm)
-            comparison_task = Task(description=f"Analyze the provided JSON data for two wallets and create a comparative report in Markdown format under the heading '### Wallet Duel Analysis'.\n\n{combined_data}\n\nAnswer the following:\n- **Primary Activity:** How do their primary activities compare?\n- **Asset Diversity:** Which wallet holds more diverse assets?\n- **Activity Level:** Which wallet appears more active?\n- **Overall Comparison:** What is the key difference or similarity between them?", expected_output="A concise, Markdown-formatted, bullet-point summary under the heading '### Wallet Duel Analysis'.", agent=comparative_analyst)
-            crew = Crew(agents=[comparative_analyst], tasks=[comparison_task], process=Process.sequential, verbose=True)
+            crew = build_comparison_crew(self.llm, [("Wallet 1", prompt_data(raw_data_1)), ("Wallet 2", prompt_data(raw_data_2))], log_capture)
+            kickoff = crew.kickoff
+            self._stage("comparative_analyst")
         else:
             # Use self.wallet_address_1 now
-            raw_onchain_data = get_wallet_data(self.wallet_address_1)
+            raw_onchain_data, = self.get_data()
             try:
                 data_json = json.loads(raw_onchain_data)
                 if 'error' in data_json:
@@ -78,6 +311,12 @@ class WalletProfilingCrew:
             except json.JSONDecodeError:
                 error_message = "Could not generate profile due to invalid data format from the source."
                 return {"result": Result(raw=error_message), "log": error_message}
+            raw_onchain_data = prompt_data(raw_onchain_data)
+
+        if self.mode == "fast":
+            kickoff = lambda: self._run_fast(raw_onchain_data)
+            self._stage("fast_report")
+        elif self.mode == "single":
 
             # Define Agents
             data_collector = Agent(
@@ -85,30 +324,134 @@ class WalletProfilingCrew:
                 # Use self.wallet_address_1
                 goal=f'Use the provided data string for the wallet address: {self.wallet_address_1}.',
                 backstory="You are a data handler. Your only job is to receive raw on-chain data and pass it to the other agents.",
-                verbose=True, allow_delegation=False, llm=self.llm
+                # Its reply is only an acknowledgement, so it is not streamed.
+                verbose=False, allow_delegation=False, llm=make_llm()
             )
-            analyst = Agent(role='Expert Crypto Wallet Analyst', goal='Analyze collected on-chain data to create a clear, bullet-point summary of the wallet\'s profile.', backstory="You are a succinct on-chain analyst who turns raw data into simple insights for non-technical users.", verbose=True, allow_delegation=False, llm=self.llm)
-            security_analyst = Agent(role='On-Chain Security Heuristics Analyst', goal='Scan wallet data for potential red flags or unusual activity patterns based on a set of heuristics.', backstory="You are a security-conscious on-chain analyst. You find patterns that are worth a second look.", verbose=True, allow_delegation=False, llm=self.llm)
+            analyst = Agent(**ANALYST_PERSONA, verbose=False, allow_delegation=False, llm=self.llm)
+            security_analyst = Agent(**SECURITY_PERSONA, verbose=False, allow_delegation=False, llm=self.llm)
             
             # Define Tasks
             data_collection_task = Task(
                 # Use self.wallet_address_1
                 description=f"This is the raw on-chain data for wallet {self.wallet_address_1}:\n\n{raw_onchain_data}",
                 expected_output="A confirmation that the data has been processed and is ready for analysis.",
-                agent=data_collector
+                agent=data_collector,
+                callback=lambda output: self._stage("analyst")
             )
-            analysis_task = Task(description=("You are an on-chain analyst. Analyze the provided JSON data. Create a brief, bullet-point summary under the heading '### Wallet Profile'. Answer:\n- **Primary Activity:** Transactions or collecting assets?\n- **Asset Diversity:** Comment on the number of different assets held.\n- **Wallet Persona:** In one short sentence, what is this wallet's likely persona?"), expected_output="A concise, Markdown-formatted, bullet-point summary under the heading '### Wallet Profile'.", agent=analyst)
-            security_task = Task(description=("You will be given a 'Wallet Profile' analysis as context. Your job is to perform a security analysis on the same raw data. Create your analysis as a bullet-point list under the heading '### Security Observations'. Consider:\n- **Token Dust:** Is the 'total_asset_classes' number high?\n- **Transaction Velocity:** Is there a full list of recent transactions?\n- **Overall Risk Profile:** Provide a one-sentence summary.\n\n**IMPORTANT:** Your final output MUST include the original 'Wallet Profile' analysis first, followed by your 'Security Observations' section."), expected_output="The complete, combined final report containing BOTH the '### Wallet Profile' and '### Security Observations' sections.", agent=security_analyst, context=[analysis_task])
+            analysis_task = Task(description=("You are an on-chain analyst. Analyze the provided JSON data. " + PROFILE_INSTRUCTIONS), expected_output="A concise, Markdown-formatted, bullet-point summary under the heading '### Wallet Profile'.", agent=analyst, callback=lambda output: self._stage("security_analyst"))
+            security_task = Task(description=("You will be given a 'Wallet Profile' analysis as context. Your job is to perform a security analysis on the same raw data. " + SECURITY_INSTRUCTIONS + "\n\n**IMPORTANT:** Your final output MUST include the original 'Wallet Profile' analysis first, followed by your 'Security Observations' section."), expected_output="The complete, combined final report containing BOTH the '### Wallet Profile' and '### Security Observations' sections.", agent=security_analyst, context=[analysis_task])
 
             # Assemble and Run Crew
-            crew = Crew(agents=[data_collector, analyst, security_analyst], tasks=[data_collection_task, analysis_task, security_task], process=Process.sequential, verbose=True)
+            crew = Crew(agents=[data_collector, analyst, security_analyst], tasks=[data_collection_task, analysis_task, security_task], process=Process.sequential, verbose=False, **crew_log_callbacks(log_capture))
+            kickoff = crew.kickoff
+            self._stage("data_collector")
 
-        log_stream = io.StringIO()
-        with contextlib.redirect_stdout(log_stream):
-            result = crew.kickoff()
-        
-        log_contents = log_stream.getvalue()
+        # Fast mode's own prints still reach the capture through the job's context.
+        with log_capture:
+            result = kickoff()
+
+        log_contents = log_capture.getvalue()
 
         final_result_object = Result(raw=str(result))
-        
-        return {"result": final_result_object, "log": log_contents}
\ No newline at end of file
+        cache_key = self.report_cache_key()
+        if cache_key:
+            get_report_cache().set(cache_key, final_result_object.raw)
+
+        return {"result": final_result_object, "log": log_contents}
+
+    def _run_fast(self, raw_onchain_data: str) -> str:
+        """Writes the profile and security sections with two concurrent LLM calls and joins them."""
+        sections = [(ANALYST_PERSONA, PROFILE_INSTRUCTIONS, make_llm(self.progress)), (SECURITY_PERSONA, SECURITY_INSTRUCTIONS, make_llm())]
+
+        def write_section(persona: dict, instructions: str, llm: RoutedLLM) -> str:
+            messages = [
+                {"role": "system", "content": f"You are an {persona['role']}. {persona['backstory']} Your goal: {persona['goal']}"},
+                {"role": "user", "content": f"This is the on-chain feature summary (JSON) for wallet {self.wallet_address_1}:\n\n{raw_onchain_data}\n\n{instructions}\nRespond with only this section in Markdown."},
+            ]
+            print(f"--- [Veritas AI] Fast mode: requesting '{persona['role']}' section ---")
+            content = llm.call(messages)
+            print(f"--- [Veritas AI] Fast mode: '{persona['role']}' section ---\n{content}")
+            return content
+
+        # Only the profile call streams tokens, so the live text stays readable. Each
+        # thread runs in a copy of this context to keep the job's log capture.
+        with ThreadPoolExecutor(max_workers=len(sections)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, write_section, *section) for section in sections]
+            return "\n\n".join(future.result().strip() for future in futures)
+
+class PortfolioProfilingCrew:
+    """Profiles a batch of wallets and compares them all at once.
+
+    Addresses that share a stake key are analyzed once. Every remaining wallet gets
+    a fast-mode profile, reported through progress.wallet_result(address, report)
+    as soon as it is ready, and the group gets one N-way comparison.
+    """
+    def __init__(self, wallet_addresses: list[str], progress=None, job_id: str | None = None, deep_mode: bool = False, bypass_cache: bool = False):
+        self.wallet_addresses = wallet_addresses
+        self.job_id = job_id or "batch"
+        self.deep_mode = deep_mode
+        self.bypass_cache = bypass_cache
+        self.progress = progress
+        self.llm = make_llm(progress, answer_marker=REACT_ANSWER_MARKER)
+
+    mode = "batch"
+
+    @property
+    def job_kind(self) -> str:
+        return f"{self.mode}-deep" if self.deep_mode else self.mode
+
+    def _stage(self, name: str):
+        mark_stage(self.progress, name)
+
+    def run(self):
+        self._stage("fetching")
+        representatives, merged = dedupe_by_stake(self.wallet_addresses)
+        wallet_data = dict(zip(representatives, get_wallets_data(*representatives, deep=self.deep_mode)))
+
+        self._stage("wallet_profiles")
+        wallet_results = {}
+        with ThreadPoolExecutor(max_workers=BATCH_PROFILE_CONCURRENCY) as pool:
+            # Copied contexts keep each profile's Blockfrost and LLM time on this job's timings.
+            futures = {pool.submit(contextvars.copy_context().run, self._profile, address, raw_data): address for address, raw_data in wallet_data.items()}
+            for future in as_completed(futures):
+                address = futures[future]
+                try:
+                    wallet_results[address] = future.result()
+                except Exception as e:
+                    wallet_results[address] = f"Could not generate profile. Reason: {e}"
+                if self.progress:
+                    self.progress.wallet_result(address, wallet_results[address])
+
+        features = {address: json.loads(raw_data) for address, raw_data in wallet_data.items()}
+        usable = [address for address in representatives if 'error' not in features[address]]
+        if len(usable) < 2:
+            comparison, log_contents = "Could not generate a portfolio comparison: fewer than two wallets returned usable data.", ""
+        else:
+            comparison, log_contents = self._compare(usable, features)
+
+        sections = [comparison, "#### Wallets Compared"]
+        sections += ["\n".join(f"- **Wallet {index}:** `{address}`" + (f" (also covers {', '.join(f'`{other}`' for other in merged[address])}, which share its stake key)" if merged[address] else "") for index, address in enumerate(usable, 1))]
+        sections += [f"## Profile: `{address}`\n\n{wallet_results[address]}" for address in representatives]
+        return {"result": Result(raw="\n\n".join(sections)), "log": log_contents, "wallet_results": wallet_results}
+
+    def _profile(self, address: str, raw_data: str) -> str:
+        crew = WalletProfilingCrew(address, job_id=f"{self.job_id}:{address}", fast_mode=True, deep_mode=self.deep_mode, wallet_data=[raw_data])
+        cached = None if self.bypass_cache else crew.cached_report()
+        return cached[0] if cached else crew.run()["result"].raw
+
+    def _compare(self, addresses: list[str], features: dict) -> tuple[str, str]:
+        # Full feature summaries for dozens of wallets would overflow a small model's
+        # context, so the comparison sees one compact row per wallet.
+        compact = [compact_features(features[address]) for address in addresses]
+        cache_key = make_report_key(self.job_kind, compact, os.environ["OPENAI_MODEL_NAME"], PROMPT_VERSION)
+        cached = None if self.bypass_cache else get_report_cache().get(cache_key)
+        if cached:
+            return cached[0], "Portfolio comparison served from the report cache."
+        labeled_data = [(f"Wallet {index}", json.dumps(compact_features(with_recency(features[address])))) for index, address in enumerate(addresses, 1)]
+        log_capture = JobLogCapture(self.job_id)
+        crew = build_comparison_crew(self.llm, labeled_data, log_capture)
+        self._stage("comparative_analyst")
+        with log_capture:
+            comparison = str(crew.kickoff())
+        get_report_cache().set(cache_key, comparison)
+        return comparison, log_capture.getvalue()
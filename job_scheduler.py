@@ -0,0 +1,138 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MAX_CONCURRENT_CREWS = int(os.environ.get("MAX_CONCURRENT_CREWS", "2"))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "20"))
+
+# Lower runs first: single-wallet profiles shouldn't wait behind duel comparisons,
+# and neither should wait behind a batch that holds a worker for minutes.
+PRIORITY_SINGLE, PRIORITY_DUEL, PRIORITY_BATCH = 0, 1, 2
+
+# Seed durations (seconds) used for ETAs until real jobs have been timed.
+DEFAULT_DURATIONS = {"single": 60.0, "fast": 25.0, "duel": 45.0, "batch": 300.0}
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept another job."""
+    def __init__(self, retry_after: float):
+        super().__init__(f"The job queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class JobScheduler:
+    """Runs jobs on a fixed number of worker threads from a bounded priority queue.
+
+    Each job carries a kind ("single", "duel", ...) whose running average duration
+    is used to estimate queue ETAs. Whenever the queue changes, on_change is called
+    with a list of (job_id, position, eta_seconds) for every queued job.
+    """
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_CREWS, max_queued: int = MAX_QUEUED_JOBS, on_change=None):
+        self.on_change = on_change
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._queue: list[tuple[int, int, str]] = []
+        self._pending: dict[str, tuple] = {}
+        self._running: dict[str, tuple[str, float]] = {}
+        self._durations = dict(DEFAULT_DURATIONS)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers: list[threading.Thread] = []
+        self._stopping = False
+
+    def submit(self, job_id: str, fn, *args, kind: str = "single", priority: int = PRIORITY_SINGLE):
+        """Queues fn(*args) to run as job_id, raising QueueFullError when the queue is full."""
+        with self._condition:
+            if len(self._queue) >= self.max_queued:
+                raise QueueFullError(self._estimate_wait(len(self._queue)))
+            self._start_workers()
+            heapq.heappush(self._queue, (priority, next(self._sequence), job_id))
+            self._pending[job_id] = (fn, args, kind, time.monotonic())
+            self._condition.notify()
+        self._publish()
+
+    def check_capacity(self):
+        """Raises QueueFullError if submit would, so callers can refuse a job before doing work for it."""
+        with self._condition:
+            if len(self._queue) >= self.max_queued:
+                raise QueueFullError(self._estimate_wait(len(self._queue)))
+
+    def cancel(self, job_id: str) -> bool:
+        """Removes a queued job. Returns False if it is not waiting in the queue."""
+        with self._condition:
+            if self._pending.pop(job_id, None) is None:
+                return False
+            self._queue = [entry for entry in self._queue if entry[2] != job_id]
+            heapq.heapify(self._queue)
+        self._publish()
+        return True
+
+    def snapshot(self) -> list[tuple[str, int, float]]:
+        """Returns (job_id, 1-based queue position, ETA in seconds until it starts) for queued jobs."""
+        with self._condition:
+            ordered = [entry[2] for entry in sorted(self._queue)]
+            return [(job_id, index + 1, self._estimate_wait(index, ordered)) for index, job_id in enumerate(ordered)]
+
+    def shutdown(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._work, name=f"crew-worker-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _estimate_wait(self, index: int, ordered: list[str] | None = None) -> float:
+        # Replay the queue onto the worker slots: each slot frees up when its
+        # running job's expected duration has elapsed.
+        now = time.monotonic()
+        slots = [max(0.0, self._duration(kind) - (now - started)) for kind, started in self._running.values()]
+        slots += [0.0] * (self.max_concurrent - len(slots))
+        heapq.heapify(slots)
+        ordered = ordered if ordered is not None else [entry[2] for entry in sorted(self._queue)]
+        for job_id in ordered[:index]:
+            kind = self._pending[job_id][2]
+            heapq.heappush(slots, heapq.heappop(slots) + self._duration(kind))
+        return slots[0]
+
+    def _duration(self, kind: str) -> float:
+        # Variants such as "single-deep" start from their base mode's estimate.
+        return self._durations.get(kind, DEFAULT_DURATIONS.get(kind.split("-")[0], DEFAULT_DURATIONS["single"]))
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                _, _, job_id = heapq.heappop(self._queue)
+                fn, args, kind, _ = self._pending.pop(job_id)
+                started = time.monotonic()
+                self._running[job_id] = (kind, started)
+            self._publish()
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception(f"Job {job_id} raised outside its own error handling")
+            finally:
+                with self._condition:
+                    del self._running[job_id]
+                    elapsed = time.monotonic() - started
+                    previous = self._duration(kind)
+                    # Exponential moving average keeps ETAs tracking the current node speed.
+                    self._durations[kind] = 0.7 * previous + 0.3 * elapsed
+            self._publish()
+
+    def _publish(self):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(self.snapshot())
+        except Exception:
+            logger.exception("Scheduler on_change hook failed")
@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+JOB_STORE_BACKEND = os.environ.get("JOB_STORE", "sqlite")
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join("data", "jobs.sqlite3"))
+# Finished jobs are dropped after JOB_TTL_SECONDS, or oldest-first beyond MAX_STORED_JOBS.
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", str(24 * 3600)))
+MAX_STORED_JOBS = int(os.environ.get("MAX_STORED_JOBS", "1000"))
+# The process running or queueing a job renews its lease every third of this. A job
+# whose lease runs out belongs to a process that died, so it is failed, not joined.
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+STALE_JOB_MESSAGE = "The server handling this job stopped before it finished. Please submit it again."
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Every field a job record can hold, beyond job_id and the bookkeeping timestamps.
+# New fields are added to existing SQLite files automatically.
+JOB_FIELDS = {
+    "status": "TEXT NOT NULL",
+    "result": "TEXT",
+    "log": "TEXT",
+    "queue_position": "INTEGER",
+    "eta_at": "REAL",
+    "stage": "TEXT",
+    "partial": "TEXT",
+    "wallet_results": "TEXT",
+    # Identical submissions share one job while it is unfinished (see join_or_create).
+    "coalesce_key": "TEXT",
+    "subscribers": "INTEGER",
+    "timings": "TEXT",
+    # "host:pid" of the process that queued the job, and until when it is presumed alive.
+    "owner": "TEXT",
+    "lease_expires_at": "REAL",
+}
+
+# Streamed tokens are batched so a fast model doesn't turn into a write per token.
+TOKEN_FLUSH_INTERVAL = 0.25
+
+class JobStore(ABC):
+    """Interface for job record storage. Records are plain dicts of JOB_FIELDS.
+
+    Jobs made by join_or_create are leased to this process (self.owner). Once
+    start_heartbeat is called, a background thread renews its leases and fails
+    other processes' unfinished jobs whose leases have run out.
+    """
+    owner: str
+    lease_seconds: float
+    _heartbeat_thread: threading.Thread | None = None
+
+    @abstractmethod
+    def create(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def join_or_create(self, job_id: str, coalesce_key: str, **fields) -> str:
+        """Atomically joins the unfinished job with coalesce_key, or creates job_id for it.
+
+        Returns the id of the job the caller is now subscribed to.
+        """
+
+    @abstractmethod
+    def detach(self, job_id: str) -> int:
+        """Unsubscribes one caller from a job and returns how many remain."""
+
+    @abstractmethod
+    def renew_leases(self):
+        """Extends the lease of every unfinished job this process owns."""
+
+    @abstractmethod
+    def fail_stale(self) -> int:
+        """Fails unfinished jobs whose owner is gone and returns how many there were."""
+
+    def start_heartbeat(self):
+        if self._heartbeat_thread is None and self.lease_seconds > 0:
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-leases", daemon=True)
+            self._heartbeat_thread.start()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self.renew_leases()
+                self.fail_stale()
+            except Exception:
+                logger.exception("Renewing job leases failed")
+
+    def _lease(self) -> dict:
+        return {"owner": self.owner, "lease_expires_at": time.time() + self.lease_seconds}
+
+def _process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _owner_is_dead(owner: str | None) -> bool:
+    """True if owner is a process on this host that no longer exists."""
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def _is_stale(job: dict, now: float) -> bool:
+    return job["status"] not in TERMINAL_STATUSES and ((job["lease_expires_at"] or 0) <= now or _owner_is_dead(job["owner"]))
+
+class MemoryJobStore(JobStore):
+    """In-process store, only suitable for a single uvicorn worker."""
+    def __init__(self, ttl: float = JOB_TTL_SECONDS, max_jobs: int = MAX_STORED_JOBS, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.lease_seconds = lease_seconds
+        self.owner = _process_owner()
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, **fields):
+        with self._lock:
+            self._insert(job_id, {**self._lease(), **fields})
+
+    def _insert(self, job_id: str, fields: dict):
+        now = time.time()
+        self._jobs[job_id] = {**dict.fromkeys(JOB_FIELDS), **fields, "job_id": job_id, "created_at": now, "updated_at": now}
+        self._evict(now)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=time.time())
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def join_or_create(self, job_id: str, coalesce_key: str, **fields) -> str:
+        with self._lock:
+            now = time.time()
+            for existing in self._jobs.values():
+                if existing["coalesce_key"] == coalesce_key and existing["status"] not in TERMINAL_STATUSES:
+                    if _is_stale(existing, now):
+                        existing.update(status="failed", result=STALE_JOB_MESSAGE, log=STALE_JOB_MESSAGE, updated_at=now)
+                        continue
+                    existing["subscribers"] += 1
+                    return existing["job_id"]
+            self._insert(job_id, {**fields, **self._lease(), "coalesce_key": coalesce_key, "subscribers": 1})
+            return job_id
+
+    def detach(self, job_id: str) -> int:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return 0
+            job["subscribers"] = max(0, (job["subscribers"] or 1) - 1)
+            return job["subscribers"]
+
+    def renew_leases(self):
+        with self._lock:
+            lease = self._lease()
+            for job in self._jobs.values():
+                if job["owner"] == self.owner and job["status"] not in TERMINAL_STATUSES:
+                    job.update(lease)
+
+    def fail_stale(self) -> int:
+        with self._lock:
+            now = time.time()
+            stale = [job for job in self._jobs.values() if _is_stale(job, now)]
+            for job in stale:
+                job.update(status="failed", result=STALE_JOB_MESSAGE, log=STALE_JOB_MESSAGE, updated_at=now)
+            return len(stale)
+
+    def _evict(self, now: float):
+        finished = sorted((job["updated_at"], job_id) for job_id, job in self._jobs.items() if job["status"] in TERMINAL_STATUSES)
+        excess = len(finished) - self.max_jobs
+        for index, (updated_at, job_id) in enumerate(finished):
+            if updated_at > now - self.ttl and index >= excess:
+                break
+            del self._jobs[job_id]
+
+class SQLiteJobStore(JobStore):
+    """Job records in a SQLite file, shared by every worker process on the host."""
+    def __init__(self, path: str = JOB_STORE_PATH, ttl: float = JOB_TTL_SECONDS, max_jobs: int = MAX_STORED_JOBS, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.lease_seconds = lease_seconds
+        self.owner = _process_owner()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+        existing = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for name, column_type in JOB_FIELDS.items():
+            if name not in existing:
+                # SQLite can't add NOT NULL columns without a default to an existing table.
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type.replace(' NOT NULL', '')}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_coalesce_key ON jobs (coalesce_key)")
+        # Jobs left unfinished by a crash or restart would otherwise stay pending forever.
+        failed = self.fail_stale()
+        if failed:
+            logger.warning(f"Marked {failed} job(s) abandoned by a stopped server as failed")
+
+    def create(self, job_id: str, **fields):
+        now = time.time()
+        fields = {**self._lease(), **fields}
+        columns = ["job_id", "created_at", "updated_at", *fields]
+        with self._lock:
+            self._db.execute(f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", (job_id, now, now, *fields.values()))
+            self._evict(now)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def join_or_create(self, job_id: str, coalesce_key: str, **fields) -> str:
+        statuses = ", ".join("?" * len(TERMINAL_STATUSES))
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two worker processes
+            # can't both miss the lookup and create duplicate jobs.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                for row in self._db.execute(f"SELECT * FROM jobs WHERE coalesce_key = ? AND status NOT IN ({statuses})", (coalesce_key, *TERMINAL_STATUSES)).fetchall():
+                    if _is_stale(dict(row), now):
+                        self._fail(row["job_id"], now)
+                        continue
+                    self._db.execute("UPDATE jobs SET subscribers = subscribers + 1 WHERE job_id = ?", (row["job_id"],))
+                    self._db.execute("COMMIT")
+                    return row["job_id"]
+                fields.update(self._lease(), coalesce_key=coalesce_key, subscribers=1)
+                columns = ["job_id", "created_at", "updated_at", *fields]
+                self._db.execute(f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", (job_id, now, now, *fields.values()))
+                self._evict(now)
+                self._db.execute("COMMIT")
+                return job_id
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def detach(self, job_id: str) -> int:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET subscribers = MAX(0, COALESCE(subscribers, 1) - 1) WHERE job_id = ?", (job_id,))
+            row = self._db.execute("SELECT subscribers FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row["subscribers"] if row else 0
+
+    def renew_leases(self):
+        statuses = ", ".join("?" * len(TERMINAL_STATUSES))
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status NOT IN ({statuses})", (time.time() + self.lease_seconds, self.owner, *TERMINAL_STATUSES))
+
+    def fail_stale(self) -> int:
+        statuses = ", ".join("?" * len(TERMINAL_STATUSES))
+        with self._lock:
+            now = time.time()
+            rows = self._db.execute(f"SELECT * FROM jobs WHERE status NOT IN ({statuses})", TERMINAL_STATUSES).fetchall()
+            stale = [row["job_id"] for row in rows if _is_stale(dict(row), now)]
+            for job_id in stale:
+                self._fail(job_id, now)
+            return len(stale)
+
+    def _fail(self, job_id: str, now: float):
+        self._db.execute("UPDATE jobs SET status = 'failed', result = ?, log = ?, updated_at = ? WHERE job_id = ?", (STALE_JOB_MESSAGE, STALE_JOB_MESSAGE, now, job_id))
+
+    def _evict(self, now: float):
+        statuses = ", ".join("?" * len(TERMINAL_STATUSES))
+        self._db.execute(f"DELETE FROM jobs WHERE status IN ({statuses}) AND updated_at <= ?", (*TERMINAL_STATUSES, now - self.ttl))
+        self._db.execute(f"DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status IN ({statuses}) ORDER BY updated_at DESC LIMIT -1 OFFSET ?)", (*TERMINAL_STATUSES, self.max_jobs))
+
+class JobProgress:
+    """Records a running job's stage and the text its current agent has streamed so far."""
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._partial: list[str] = []
+        self._wallet_results: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def stage(self, name: str):
+        with self._lock:
+            # Tokens since the last flush still belong to the previous stage.
+            if self._partial:
+                self.store.update(self.job_id, partial="".join(self._partial))
+            self._partial = []
+            self.store.update(self.job_id, stage=name, partial="")
+
+    def token(self, text: str):
+        with self._lock:
+            self._partial.append(text)
+            now = time.monotonic()
+            if now - self._last_flush >= TOKEN_FLUSH_INTERVAL:
+                self._last_flush = now
+                self.store.update(self.job_id, partial="".join(self._partial))
+
+    def wallet_result(self, address: str, report: str):
+        """Publishes one finished wallet profile of a batch job."""
+        with self._lock:
+            self._wallet_results[address] = report
+            self.store.update(self.job_id, wallet_results=json.dumps(self._wallet_results))
+
+def create_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    """Builds the job store selected by the JOB_STORE environment variable."""
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        return SQLiteJobStore()
+    raise ValueError(f"Unknown JOB_STORE backend: {backend!r}")
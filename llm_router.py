@@ -0,0 +1,220 @@
+import os
+import time
+import threading
+from typing import Iterator
+import httpx
+from crewai import BaseLLM
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+from langchain_openai import ChatOpenAI
+from logging_config import get_logger
+from metrics import LLM_NODE_REQUESTS, current_timings
+
+logger = get_logger(__name__)
+
+# Calls a single node may have in flight; Gaia nodes slow down sharply when oversubscribed.
+NODE_MAX_CONCURRENCY = int(os.environ.get("LLM_NODE_MAX_CONCURRENCY", "4"))
+REQUEST_TIMEOUT = float(os.environ.get("LLM_REQUEST_TIMEOUT", "120"))
+# Nodes tried per call before giving up, each a different node while any is left.
+MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", "3"))
+HEALTH_CHECK_INTERVAL = float(os.environ.get("LLM_HEALTH_CHECK_INTERVAL", "30"))
+
+class LLMNode:
+    """One OpenAI-compatible endpoint, with shared clients and its routing state."""
+    def __init__(self, url: str, model: str, api_key: str, max_concurrency: int = NODE_MAX_CONCURRENCY):
+        self.url = url
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.healthy = True
+        self.latency = None
+        # The router retries on other nodes, so the clients themselves never retry.
+        self.client = ChatOpenAI(model=model, base_url=url, api_key=api_key, request_timeout=REQUEST_TIMEOUT, max_retries=0)
+        self.streaming_client = ChatOpenAI(model=model, base_url=url, api_key=api_key, request_timeout=REQUEST_TIMEOUT, max_retries=0, streaming=True, stream_usage=True)
+
+    def score(self) -> tuple:
+        # Least outstanding relative to capacity first, then the faster node.
+        return (self.outstanding / self.max_concurrency, self.latency or 0.0)
+
+    def stats(self) -> dict:
+        return {"url": self.url, "healthy": self.healthy, "outstanding": self.outstanding, "max_concurrency": self.max_concurrency, "latency_seconds": round(self.latency, 3) if self.latency else None}
+
+class LLMRouter:
+    """Spreads LLM calls over a pool of nodes.
+
+    Each call goes to the healthy node with the fewest calls in flight relative to
+    its cap, waiting if every node is at its cap. A call that fails with a timeout,
+    connection error, 429 or 5xx marks the node unhealthy and is retried on another
+    node. A background check probes every node's /models and brings recovered nodes
+    back. If no node is healthy, calls still go to the least loaded one.
+    """
+    def __init__(self, nodes: list[LLMNode], max_attempts: int = MAX_ATTEMPTS, health_check_interval: float = HEALTH_CHECK_INTERVAL):
+        self.nodes = nodes
+        self.max_attempts = max_attempts
+        self.health_check_interval = health_check_interval
+        self._condition = threading.Condition()
+        self._health_thread: threading.Thread | None = None
+
+    def call(self, fn):
+        """Runs fn(node) on the best available node, failing over on node errors."""
+        tried = []
+        for attempt in range(self.max_attempts):
+            node = self._acquire(tried)
+            started = time.monotonic()
+            try:
+                result = fn(node)
+            except Exception as e:
+                self._release(node, "node_error" if is_node_error(e) else "error")
+                if not is_node_error(e) or attempt == self.max_attempts - 1:
+                    raise
+                tried.append(node)
+                logger.warning(f"LLM node {node.url} failed ({type(e).__name__}: {e}), retrying on another node")
+                continue
+            self._release(node, "ok", time.monotonic() - started)
+            return result
+
+    def stream(self, fn) -> Iterator:
+        """Like call, for a generator fn(node). Fails over only until the first chunk is out."""
+        tried = []
+        for attempt in range(self.max_attempts):
+            node = self._acquire(tried)
+            started, streamed, outcome = time.monotonic(), False, "error"
+            # The slot is released in finally, so a consumer that stops reading early frees it too.
+            try:
+                for chunk in fn(node):
+                    streamed = True
+                    yield chunk
+                outcome = "ok"
+            except Exception as e:
+                outcome = "node_error" if is_node_error(e) else "error"
+                if streamed or outcome == "error" or attempt == self.max_attempts - 1:
+                    raise
+                tried.append(node)
+                logger.warning(f"LLM node {node.url} failed ({type(e).__name__}: {e}), retrying on another node")
+                continue
+            finally:
+                self._release(node, outcome, time.monotonic() - started)
+            return
+
+    def stats(self) -> list[dict]:
+        with self._condition:
+            return [node.stats() for node in self.nodes]
+
+    def start_health_checks(self):
+        with self._condition:
+            if self._health_thread is None and self.health_check_interval > 0:
+                self._health_thread = threading.Thread(target=self._check_health, name="llm-health", daemon=True)
+                self._health_thread.start()
+
+    def _acquire(self, tried: list[LLMNode]) -> LLMNode:
+        with self._condition:
+            while True:
+                # Prefer healthy nodes not yet tried for this call, then any untried, then any.
+                untried = [node for node in self.nodes if node not in tried] or self.nodes
+                candidates = [node for node in untried if node.healthy] or untried
+                available = [node for node in candidates if node.outstanding < node.max_concurrency]
+                if available:
+                    node = min(available, key=LLMNode.score)
+                    node.outstanding += 1
+                    return node
+                self._condition.wait()
+
+    def _release(self, node: LLMNode, outcome: str, elapsed: float | None = None):
+        with self._condition:
+            node.outstanding -= 1
+            if outcome == "node_error":
+                node.healthy = False
+            elif outcome == "ok":
+                node.healthy = True
+                node.latency = elapsed if node.latency is None else 0.8 * node.latency + 0.2 * elapsed
+            self._condition.notify_all()
+        LLM_NODE_REQUESTS.labels(node.url, outcome).inc()
+
+    def _check_health(self):
+        while True:
+            time.sleep(self.health_check_interval)
+            for node in self.nodes:
+                try:
+                    response = httpx.get(f"{node.url.rstrip('/')}/models", headers={"Authorization": f"Bearer {node.api_key}"}, timeout=5)
+                    healthy = response.status_code < 500
+                except httpx.HTTPError:
+                    healthy = False
+                with self._condition:
+                    if healthy != node.healthy:
+                        logger.info(f"LLM node {node.url} is now {'healthy' if healthy else 'unhealthy'}")
+                    node.healthy = healthy
+                    self._condition.notify_all()
+
+def is_node_error(error: Exception) -> bool:
+    """True for failures another node might not have: timeouts, connection errors, 429 and 5xx."""
+    if isinstance(error, (APITimeoutError, APIConnectionError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+class RoutedLLM(BaseLLM):
+    """crewAI LLM that sends each call through the LLM router.
+
+    crewAI turns any agent LLM that is not its own into a plain crewAI LLM, dropping
+    LangChain callbacks and the base URL, so token streaming and per-call metrics are
+    done here instead. on_token, if given, receives every streamed token; with an
+    answer_marker, only the tokens after it (e.g. a ReAct reply's "Final Answer:").
+    Each call's time and token usage are recorded against the current job's timings.
+    """
+    def __init__(self, router: LLMRouter, model: str, on_token=None, answer_marker: str | None = None):
+        super().__init__(model=model, temperature=None)
+        self.router = router
+        self.on_token = on_token
+        self.answer_marker = answer_marker
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        # crewAI sets stop words (e.g. "\nObservation:") for its ReAct-style prompts.
+        stop = self.stop or None
+        started = time.monotonic()
+        if self.on_token:
+            text, usage = self._stream(messages, stop)
+        else:
+            message = self.router.call(lambda node: node.client.invoke(messages, stop=stop))
+            text, usage = message.content, message.usage_metadata
+        timings = current_timings()
+        if timings is not None:
+            usage = usage or {}
+            timings.llm_call(time.monotonic() - started, usage.get("input_tokens"), usage.get("output_tokens"))
+        return text
+
+    def _stream(self, messages: list[dict], stop: list[str] | None) -> tuple[str, dict | None]:
+        parts, usage, answering = [], None, self.answer_marker is None
+        for chunk in self.router.stream(lambda node: node.streaming_client.stream(messages, stop=stop)):
+            if chunk.content:
+                parts.append(chunk.content)
+                if answering:
+                    self.on_token(chunk.content)
+                elif self.answer_marker in (text := "".join(parts)):
+                    # Everything before the marker is the agent's reasoning, not the report.
+                    answering = True
+                    answer = text.split(self.answer_marker, 1)[1].lstrip()
+                    if answer:
+                        self.on_token(answer)
+            # With stream_usage, the token counts arrive on the last chunk.
+            usage = chunk.usage_metadata or usage
+        return "".join(parts), usage
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+_router: LLMRouter | None = None
+_router_lock = threading.Lock()
+
+def get_router() -> LLMRouter:
+    """Returns the process-wide router over GAIA_NODE_URLS (or the single GAIA_NODE_URL)."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            urls = [url.strip() for url in os.environ.get("GAIA_NODE_URLS", "").split(",") if url.strip()] or [os.environ["OPENAI_API_BASE"]]
+            # The "openai/" prefix only tells LiteLLM which API to use; nodes expect the bare name.
+            model = os.environ["OPENAI_MODEL_NAME"].removeprefix("openai/")
+            nodes = [LLMNode(url, model, os.environ["OPENAI_API_KEY"]) for url in urls]
+            _router = LLMRouter(nodes)
+            _router.start_health_checks()
+            logger.info(f"LLM router started with {len(nodes)} node(s): {', '.join(urls)}")
+        return _router
@@ -1,7 +1,15 @@
 import os
+import io
+import sys
 import logging
+import threading
+from collections import deque
+from contextvars import ContextVar
 from logging.handlers import RotatingFileHandler
 
+# Per-job agent output kept in memory for /status; the full log goes to the log file.
+JOB_LOG_MAX_CHARS = int(os.environ.get("JOB_LOG_MAX_CHARS", str(64 * 1024)))
+
 def setup_logging(log_level=logging.INFO):
     """
     Configure application-wide logging
@@ -52,4 +60,99 @@ def get_logger(name):
     Returns:
         A logger instance with the specified name
     """
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
+
+_current_capture = ContextVar("job_log_capture", default=None)
+_router_lock = threading.Lock()
+
+class _StdoutRouter(io.TextIOBase):
+    """Stands in for sys.stdout, sending each write to the current job's capture, if any."""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        capture = _current_capture.get()
+        if capture is None:
+            return self.stream.write(text)
+        capture.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def isatty(self):
+        # Keep terminal colour codes out of captured logs.
+        return _current_capture.get() is None and self.stream.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def _install_stdout_router():
+    with _router_lock:
+        if not isinstance(sys.stdout, _StdoutRouter):
+            sys.stdout = _StdoutRouter(sys.stdout)
+
+class JobLogCapture:
+    """
+    Captures everything the current job prints, without touching other jobs' output
+
+    Unlike contextlib.redirect_stdout, capture is scoped to the current context
+    (thread), so concurrent jobs don't interleave. Output made on other threads,
+    such as crewAI's step and task callbacks, is passed to write() directly. Only
+    the last max_chars are kept in memory; every line is also written to the
+    "veritas.agent_log" logger, i.e. the rotating log file configured by setup_logging.
+
+    Args:
+        job_id: Identifier prefixed to each spilled log line
+        max_chars: Size of the in-memory ring buffer
+    """
+    def __init__(self, job_id, max_chars=JOB_LOG_MAX_CHARS):
+        self.job_id = job_id
+        self.max_chars = max_chars
+        self.logger = get_logger("veritas.agent_log")
+        self._lines = deque()
+        self._chars = 0
+        self._dropped = 0
+        self._partial = ""
+        self._token = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        _install_stdout_router()
+        self._token = _current_capture.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._partial:
+            self._append(self._partial)
+            self._partial = ""
+        _current_capture.reset(self._token)
+
+    def write(self, text):
+        # A job may fan out to threads that share its context (e.g. fast mode).
+        with self._lock:
+            *lines, self._partial = (self._partial + text).split("\n")
+            # Output that never ends a line (e.g. streamed tokens) is flushed in
+            # max_chars pieces, as is any longer line, so nothing outgrows the buffer.
+            if len(self._partial) >= self.max_chars:
+                lines.append(self._partial)
+                self._partial = ""
+            for line in lines:
+                for start in range(0, max(len(line), 1), self.max_chars):
+                    self._append(line[start:start + self.max_chars])
+
+    def _append(self, line):
+        self.logger.info(f"[job {self.job_id}] {line}")
+        self._lines.append(line)
+        self._chars += len(line) + 1
+        while self._chars > self.max_chars and len(self._lines) > 1:
+            self._chars -= len(self._lines.popleft()) + 1
+            self._dropped += 1
+
+    def getvalue(self):
+        """Returns the retained tail of the captured output."""
+        with self._lock:
+            text = "\n".join(self._lines)
+        if self._dropped:
+            return f"[... {self._dropped} earlier lines omitted, see logs/app.log for the full log ...]\n{text}"
+        return text
@@ -1,34 +1,78 @@
 import os
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import json
+import asyncio
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import uuid
+import time
+import hashlib
+from datetime import datetime, timezone
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from logging_config import setup_logging
+setup_logging()
+
 # Import our new crew definition
-from crew_definition import WalletProfilingCrew
+from crew_definition import MAX_BATCH_WALLETS, PortfolioProfilingCrew, WalletProfilingCrew
+import blockfrost_client
+from blockfrost_cache import get_cache
+from report_cache import get_report_cache
+from job_scheduler import JobScheduler, QueueFullError, PRIORITY_SINGLE, PRIORITY_DUEL, PRIORITY_BATCH
+from job_store import TERMINAL_STATUSES, JobProgress, create_job_store
+from metrics import JobTimings, render_metrics
+from llm_router import get_router
+
+# Job records live in a store shared by all uvicorn workers (see job_store.py);
+# only the scheduler's queue is local to the process that accepted the job.
+jobs = create_job_store()
+
+def publish_queue(snapshot):
+    now = time.time()
+    for job_id, position, eta in snapshot:
+        jobs.update(job_id, queue_position=position, eta_at=now + eta)
 
-jobs = {}
+scheduler = JobScheduler(on_change=publish_queue)
 
 class Job(BaseModel):
     job_id: str
     status: str
+    stage: str | None = None
     result: str | None = None
     log: str | None = None
+    queue_position: int | None = None
+    eta_seconds: float | None = None
+    wallet_results: dict[str, str] | None = None
+    timings: dict | None = None
 
 class StartJobInput(BaseModel):
     wallet_address_1: str
     wallet_address_2: str | None = None
+    bypass_cache: bool = False
+    fast_mode: bool = False
+    deep_mode: bool = False
 
 class StartJobRequest(BaseModel):
     input_data: StartJobInput
 
+class StartBatchJobInput(BaseModel):
+    wallet_addresses: list[str]
+    bypass_cache: bool = False
+    deep_mode: bool = False
+
+class StartBatchJobRequest(BaseModel):
+    input_data: StartBatchJobInput
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting Veritas AI Agent...")
+    jobs.start_heartbeat()
     yield
+    scheduler.shutdown()
+    blockfrost_client.shutdown()
     print("Shutting down Veritas AI Agent.")
 
 app = FastAPI(
@@ -38,45 +82,247 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-def run_crew_in_background(job_id: str, wallet_address_1: str, wallet_address_2: str | None):
+def run_crew_in_background(job_id: str, crew: WalletProfilingCrew | PortfolioProfilingCrew, timings: JobTimings):
     """This function runs the CrewAI task in the background to avoid blocking the API."""
+    timings.started()
+    # The cancel request may have been handled by another worker process.
+    if is_cancelled(job_id):
+        timings.finish("cancelled")
+        return
+    with timings.activate():
+        try:
+            jobs.update(job_id, status="running", queue_position=None, eta_at=None)
+            response_data = crew.run()
+            # A job cancelled while its crew was running keeps its cancelled status.
+            if is_cancelled(job_id):
+                timings.finish("cancelled")
+                jobs.update(job_id, timings=json.dumps(timings.as_dict()))
+                return
+            timings.finish("completed")
+            jobs.update(job_id, status="completed", result=response_data["result"].raw, log=response_data["log"], timings=json.dumps(timings.as_dict()))
+        except Exception as e:
+            timings.finish("failed")
+            jobs.update(job_id, status="failed", result=f"An error occurred: {e}", log=f"Error during execution: {e}", timings=json.dumps(timings.as_dict()))
+
+def is_cancelled(job_id: str) -> bool:
+    job = jobs.get(job_id)
+    return job is None or job["status"] == "cancelled"
+
+def is_cardano_address(address: str | None) -> bool:
+    return bool(address) and (address.startswith("addr1") or address.startswith("addr_test1"))
+
+def make_coalesce_key(job_kind: str, wallet_addresses: list[str], **options) -> str:
+    """Identifies submissions that would do exactly the same work."""
+    payload = json.dumps({"kind": job_kind, "addresses": sorted(set(wallet_addresses)), "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def submit_job(job_id: str, crew: WalletProfilingCrew | PortfolioProfilingCrew, priority: int, timings: JobTimings | None = None):
+    timings = timings or JobTimings(crew.job_kind)
+    timings.queued()
     try:
-        jobs[job_id].status = "running"
-        crew = WalletProfilingCrew(wallet_address_1=wallet_address_1, wallet_address_2=wallet_address_2)
-        response_data = crew.run()
-        jobs[job_id].status = "completed"
-        jobs[job_id].result = response_data["result"].raw 
-        jobs[job_id].log = response_data["log"] 
-    except Exception as e:
-        jobs[job_id].status = "failed"
-        jobs[job_id].result = f"An error occurred: {e}"
-        jobs[job_id].log = f"Error during execution: {e}"
+        scheduler.submit(job_id, run_crew_in_background, job_id, crew, timings, kind=crew.job_kind, priority=priority)
+    except QueueFullError as e:
+        reject_job(job_id, e)
+
+def admit_job(job_id: str):
+    """Refuses a new job with a 429 before any Blockfrost or cache work is done for it."""
+    try:
+        scheduler.check_capacity()
+    except QueueFullError as e:
+        reject_job(job_id, e)
+
+def fail_unqueued_job(job_id: str, error: Exception):
+    """Fails a job that broke before reaching the queue, so callers that joined it aren't left waiting."""
+    jobs.update(job_id, status="failed", result=f"An error occurred: {error}", log=f"Error before the job was queued: {error}")
+
+def reject_job(job_id: str, error: QueueFullError):
+    message = "Too many analyses are queued. Please retry later."
+    # Failing the job first stops new submissions joining it. Anyone who joined while
+    # it was fetching keeps a failed job to read, rather than a 404.
+    jobs.update(job_id, status="failed", result=message, log=message)
+    if jobs.detach(job_id) == 0:
+        jobs.delete(job_id)
+    raise HTTPException(status_code=429, detail=message, headers={"Retry-After": str(max(1, round(error.retry_after)))})
 
 @app.post("/start_job", response_model=Job, summary="Start a Wallet Profiling Job")
-def start_job(request: StartJobRequest, background_tasks: BackgroundTasks):
+def start_job(request: StartJobRequest):
     """
     Starts a new AI-powered analysis. Can be a single wallet profile
-    or a comparative analysis between two wallets.
+    or a comparative analysis between two wallets. Submitting the same analysis
+    while it is still unfinished returns the existing job instead of a new one.
     """
     wallet_address_1 = request.input_data.wallet_address_1
     wallet_address_2 = request.input_data.wallet_address_2
     
-    if not wallet_address_1 or not (wallet_address_1.startswith("addr1") or wallet_address_1.startswith("addr_test1")):
+    if not is_cardano_address(wallet_address_1):
         raise HTTPException(status_code=400, detail="A valid primary Cardano wallet address (addr1... or addr_test1...) is required.")
-    if wallet_address_2 and not (wallet_address_2.startswith("addr1") or wallet_address_2.startswith("addr_test1")):
+    if wallet_address_2 and not is_cardano_address(wallet_address_2):
          raise HTTPException(status_code=400, detail="The second Cardano wallet address is invalid.")
 
     job_id = str(uuid.uuid4())
-    jobs[job_id] = Job(job_id=job_id, status="pending")
-    background_tasks.add_task(run_crew_in_background, job_id, wallet_address_1, wallet_address_2)
-    return jobs[job_id]
+    crew = WalletProfilingCrew(wallet_address_1=wallet_address_1, wallet_address_2=wallet_address_2, progress=JobProgress(jobs, job_id), job_id=job_id, fast_mode=request.input_data.fast_mode, deep_mode=request.input_data.deep_mode)
+    # The job is registered before the cache lookup, so duplicates arriving while
+    # it fetches join it too. Only a bypass_cache request can skip the report cache,
+    # so it never shares a job with one that might be answered from it.
+    coalesce_key = make_coalesce_key(crew.job_kind, [address for address in (wallet_address_1, wallet_address_2) if address], bypass_cache=request.input_data.bypass_cache)
+    joined_id = jobs.join_or_create(job_id, coalesce_key, status="pending")
+    if joined_id != job_id:
+        return get_status(joined_id)
+    try:
+        # Joining costs nothing, but a new job's cache lookup fetches the wallet, so a
+        # full queue turns it away first.
+        admit_job(job_id)
+        # An unchanged wallet (same data, model and prompts) gets its previous report back immediately.
+        # The lookup fetches the job's wallet data, so it is the job's first fetching stage.
+        timings = JobTimings(crew.job_kind)
+        with timings.activate():
+            timings.stage("fetching")
+            cached = None if request.input_data.bypass_cache else crew.cached_report()
+        if cached:
+            report, created_at = cached
+            analyzed_at = datetime.fromtimestamp(created_at, timezone.utc).isoformat(timespec="seconds")
+            timings.finish("completed")
+            jobs.update(job_id, status="completed", result=report, log=f"Served from the report cache: on-chain data is unchanged since the analysis at {analyzed_at}.", timings=json.dumps(timings.as_dict()))
+            return get_status(job_id)
+        submit_job(job_id, crew, PRIORITY_DUEL if crew.mode == "duel" else PRIORITY_SINGLE, timings)
+    except HTTPException:
+        # A 429 has already removed the job.
+        raise
+    except Exception as e:
+        fail_unqueued_job(job_id, e)
+    return get_status(job_id)
+
+@app.post("/start_batch_job", response_model=Job, summary="Start a Portfolio Profiling Job")
+def start_batch_job(request: StartBatchJobRequest):
+    """
+    Profiles a list of wallets and compares them all. Addresses sharing a stake key
+    are analyzed once. Each wallet's profile appears in `wallet_results` as soon as
+    it is ready; the final result holds the N-way comparison and every profile.
+    """
+    wallet_addresses = request.input_data.wallet_addresses
+    if not 2 <= len(wallet_addresses) <= MAX_BATCH_WALLETS:
+        raise HTTPException(status_code=400, detail=f"A batch needs between 2 and {MAX_BATCH_WALLETS} wallet addresses.")
+    invalid = [address for address in wallet_addresses if not is_cardano_address(address)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid Cardano wallet addresses: {', '.join(invalid)}")
+
+    job_id = str(uuid.uuid4())
+    crew = PortfolioProfilingCrew(wallet_addresses, progress=JobProgress(jobs, job_id), job_id=job_id, deep_mode=request.input_data.deep_mode, bypass_cache=request.input_data.bypass_cache)
+    # A batch reads the caches while it runs, so bypass_cache changes its work.
+    coalesce_key = make_coalesce_key(crew.job_kind, wallet_addresses, bypass_cache=request.input_data.bypass_cache)
+    joined_id = jobs.join_or_create(job_id, coalesce_key, status="pending")
+    if joined_id != job_id:
+        return get_status(joined_id)
+    try:
+        submit_job(job_id, crew, PRIORITY_BATCH)
+    except HTTPException:
+        # A 429 has already removed the job.
+        raise
+    except Exception as e:
+        fail_unqueued_job(job_id, e)
+    return get_status(job_id)
 
 @app.get("/status", response_model=Job, summary="Check Job Status")
 def get_status(job_id: str):
     job = jobs.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    return job_from_record(job)
+
+def job_from_record(job: dict) -> Job:
+    queued = job["status"] == "pending" and job["eta_at"] is not None
+    eta_seconds = round(max(0.0, job["eta_at"] - time.time()), 1) if queued else None
+    wallet_results = json.loads(job["wallet_results"]) if job["wallet_results"] else None
+    timings = json.loads(job["timings"]) if job["timings"] else None
+    return Job(job_id=job["job_id"], status=job["status"], stage=job["stage"], result=job["result"], log=job["log"], queue_position=job["queue_position"] if queued else None, eta_seconds=eta_seconds, wallet_results=wallet_results, timings=timings)
+
+STREAM_POLL_INTERVAL = 0.25
+STREAM_HEARTBEAT_INTERVAL = 15.0
+
+@app.get("/status/stream", summary="Stream Job Progress")
+async def stream_status(job_id: str):
+    """
+    Streams a job as Server-Sent Events: `status` events on every status, stage or
+    queue change, `token` events carrying newly generated report text, `wallet`
+    events as each profile of a batch job finishes, and a final `done` event with
+    the full job once it finishes.
+    """
+    if not await asyncio.to_thread(jobs.get, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(job_events(job_id), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def job_events(job_id: str):
+    # Progress is read back from the job store, so the stream works on any worker.
+    last_status, sent_text, last_sent = None, "", time.monotonic()
+    sent_wallets = set()
+    while True:
+        record = await asyncio.to_thread(jobs.get, job_id)
+        if record is None:
+            yield sse_event("error", {"detail": "Job not found"})
+            return
+        job = job_from_record(record)
+        # The ETA ticks down on every poll, so it only triggers an event alongside real changes.
+        status = (job.status, job.stage, job.queue_position)
+        if status != last_status:
+            if last_status and job.stage != last_status[1]:
+                sent_text = ""
+            last_status = status
+            yield sse_event("status", job.model_dump(include={"status", "stage", "queue_position", "eta_seconds"}))
+            last_sent = time.monotonic()
+        for address, report in (job.wallet_results or {}).items():
+            if address not in sent_wallets:
+                sent_wallets.add(address)
+                yield sse_event("wallet", {"address": address, "result": report})
+        if job.status in TERMINAL_STATUSES:
+            yield sse_event("done", job.model_dump())
+            return
+        partial = record["partial"] or ""
+        if partial.startswith(sent_text) and len(partial) > len(sent_text):
+            yield sse_event("token", {"stage": job.stage, "text": partial[len(sent_text):]})
+            sent_text, last_sent = partial, time.monotonic()
+        elif time.monotonic() - last_sent > STREAM_HEARTBEAT_INTERVAL:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+@app.post("/cancel", response_model=Job, summary="Cancel a Job")
+def cancel_job(job_id: str):
+    """
+    Cancels a queued or running job. A running crew finishes its current LLM call
+    in the background, but its result is discarded. A job shared by several
+    identical submissions keeps running until every one of them has cancelled.
+    """
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}.")
+    if jobs.detach(job_id) > 0:
+        return get_status(job_id)
+    jobs.update(job_id, status="cancelled", queue_position=None, eta_at=None)
+    scheduler.cancel(job_id)
+    return get_status(job_id)
+
+@app.get("/cache_stats", summary="Cache Statistics")
+def cache_stats():
+    """Reports Blockfrost and report cache sizes and hit/miss counters for this worker."""
+    cache = get_cache()
+    blockfrost_stats = {"enabled": True, **cache.stats()} if cache else {"enabled": False}
+    return {"blockfrost": blockfrost_stats, "reports": get_report_cache().stats()}
+
+@app.get("/llm_nodes", summary="LLM Node Status")
+def llm_nodes():
+    """Reports each Gaia node's health, calls in flight, cap and average call latency for this worker."""
+    return {"nodes": get_router().stats()}
+
+@app.get("/metrics", summary="Prometheus Metrics")
+def metrics():
+    """Exposes Blockfrost, queue, agent, token and job timing histograms for Prometheus."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,141 @@
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+# Job and stage durations run from seconds to many minutes on a slow node.
+LONG_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600, 1200)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+BLOCKFROST_SECONDS = Histogram("veritas_blockfrost_request_seconds", "Blockfrost request time per endpoint, including retries.", ["endpoint"])
+QUEUE_WAIT_SECONDS = Histogram("veritas_job_queue_wait_seconds", "Time a job waits in the queue before a worker starts it.", ["kind"], buckets=LONG_BUCKETS)
+STAGE_SECONDS = Histogram("veritas_job_stage_seconds", "Time a job spends in each stage (fetching, each agent or task).", ["kind", "stage"], buckets=LONG_BUCKETS)
+LLM_SECONDS = Histogram("veritas_llm_call_seconds", "Time per LLM call, by the job stage that made it.", ["kind", "stage"], buckets=LONG_BUCKETS)
+LLM_TOKENS = Histogram("veritas_llm_tokens", "Prompt and completion tokens per LLM call.", ["kind", "stage", "type"], buckets=TOKEN_BUCKETS)
+LLM_NODE_REQUESTS = Counter("veritas_llm_node_requests", "LLM calls per node, by outcome (ok, node_error, error).", ["node", "outcome"])
+JOB_SECONDS = Histogram("veritas_job_seconds", "Total job time from submission to finish.", ["kind", "status"], buckets=LONG_BUCKETS)
+
+# Addresses, stake keys, tx hashes and asset units would make every path its own series.
+_PATH_IDS = re.compile(r"^/(addresses|accounts|txs|assets)/[^/]+")
+
+def endpoint_label(path: str) -> str:
+    """Turns a Blockfrost path into its endpoint template, e.g. /txs/{id}/utxos."""
+    return _PATH_IDS.sub(r"/\1/{id}", path)
+
+class JobTimings:
+    """Collects one job's timing breakdown and feeds the Prometheus histograms.
+
+    A job's timings are made current with activate(), so Blockfrost requests and
+    LLM calls made on its behalf (including from copied contexts) are attributed to it.
+    The total runs from construction; the queue wait from queued() to started().
+    """
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._submitted = time.monotonic()
+        self._queued = self._submitted
+        self._stage: tuple[str, float] | None = None
+        self.queue_wait: float | None = None
+        self.stages: dict[str, float] = {}
+        self.blockfrost: dict[str, dict] = {}
+        self.llm: dict[str, dict] = {}
+        self.total: float | None = None
+
+    def queued(self):
+        """Marks the job entering the queue, ending any stage run before it (e.g. the cache lookup)."""
+        with self._lock:
+            self._close_stage()
+            self._stage = None
+            self._queued = time.monotonic()
+
+    def started(self):
+        """Marks the end of the queue wait."""
+        self.queue_wait = time.monotonic() - self._queued
+        QUEUE_WAIT_SECONDS.labels(self.kind).observe(self.queue_wait)
+
+    def stage(self, name: str):
+        with self._lock:
+            self._close_stage()
+            self._stage = (name, time.monotonic())
+
+    @property
+    def current_stage(self) -> str:
+        stage = self._stage
+        return stage[0] if stage else "none"
+
+    def blockfrost_request(self, endpoint: str, seconds: float):
+        with self._lock:
+            entry = self.blockfrost.setdefault(endpoint, {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+
+    def llm_call(self, seconds: float, prompt_tokens: int | None, completion_tokens: int | None):
+        stage = self.current_stage
+        LLM_SECONDS.labels(self.kind, stage).observe(seconds)
+        for token_type, count in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+            if count is not None:
+                LLM_TOKENS.labels(self.kind, stage, token_type).observe(count)
+        with self._lock:
+            entry = self.llm.setdefault(stage, {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["prompt_tokens"] += prompt_tokens or 0
+            entry["completion_tokens"] += completion_tokens or 0
+
+    def finish(self, status: str):
+        with self._lock:
+            self._close_stage()
+            self._stage = None
+            self.total = time.monotonic() - self._submitted
+        JOB_SECONDS.labels(self.kind, status).observe(self.total)
+
+    def as_dict(self) -> dict:
+        def rounded(value):
+            if isinstance(value, dict):
+                return {key: rounded(item) for key, item in value.items()}
+            return round(value, 3) if isinstance(value, float) else value
+        with self._lock:
+            return rounded({"queue_wait": self.queue_wait, "stages": self.stages, "blockfrost": self.blockfrost, "llm": self.llm, "total": self.total})
+
+    @contextmanager
+    def activate(self):
+        token = _current_timings.set(self)
+        try:
+            yield self
+        finally:
+            _current_timings.reset(token)
+
+    def _close_stage(self):
+        if self._stage is None:
+            return
+        name, started = self._stage
+        elapsed = time.monotonic() - started
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+        STAGE_SECONDS.labels(self.kind, name).observe(elapsed)
+
+_current_timings: ContextVar[JobTimings | None] = ContextVar("job_timings", default=None)
+
+def current_timings() -> JobTimings | None:
+    return _current_timings.get()
+
+def observe_blockfrost(path: str, seconds: float):
+    endpoint = endpoint_label(path)
+    BLOCKFROST_SECONDS.labels(endpoint).observe(seconds)
+    timings = current_timings()
+    if timings is not None:
+        timings.blockfrost_request(endpoint, seconds)
+
+def render_metrics() -> tuple[bytes, str]:
+    """Returns the exposition body and content type for /metrics.
+
+    With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR (to an empty
+    directory, before start-up) so every worker's samples are aggregated.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,61 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import Counter
+
+CACHE_PATH = os.environ.get("REPORT_CACHE_PATH", os.path.join("data", "report_cache.sqlite3"))
+MAX_ENTRIES = int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "500"))
+
+def make_report_key(mode: str, wallet_data: list[dict], model: str, prompt_version: str) -> str:
+    """Fingerprints everything a finished report depends on."""
+    payload = json.dumps({"mode": mode, "wallet_data": wallet_data, "model": model, "prompt_version": prompt_version}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ReportCache:
+    """SQLite-backed store of finished reports, evicting least recently used beyond max_entries."""
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS reports (key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS reports_last_used ON reports (last_used)")
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """Returns (result, created_at) for a cached report, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT result, created_at FROM reports WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["miss"] += 1
+                return None
+            self._db.execute("UPDATE reports SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._stats["hit"] += 1
+            return row[0], row[1]
+
+    def set(self, key: str, result: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO reports (key, result, created_at, last_used) VALUES (?, ?, ?, ?)", (key, result, now, now))
+            self._db.execute("DELETE FROM reports WHERE key IN (SELECT key FROM reports ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+            return {"entries": entries, "capacity": self.max_entries, "counters": dict(self._stats)}
+
+_cache: ReportCache | None = None
+_cache_lock = threading.Lock()
+
+def get_report_cache() -> ReportCache:
+    """Returns the process-wide report cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportCache()
+        return _cache
@@ -0,0 +1,130 @@
+import socket
+import subprocess
+import sys
+import time
+import pytest
+from job_store import STALE_JOB_MESSAGE, JobProgress, JobStore, MemoryJobStore, SQLiteJobStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == "memory":
+            return MemoryJobStore(**options)
+        return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"), **options)
+    return make
+
+@pytest.fixture
+def store(make_store):
+    return make_store()
+
+def dead_owner() -> str:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+def test_identical_submissions_share_a_job(store):
+    assert store.join_or_create("a", "key", status="pending") == "a"
+    assert store.join_or_create("b", "key", status="pending") == "a"
+    assert store.get("b") is None
+    assert store.get("a")["subscribers"] == 2
+
+def test_different_keys_get_their_own_jobs(store):
+    assert store.join_or_create("a", "key-1", status="pending") == "a"
+    assert store.join_or_create("b", "key-2", status="pending") == "b"
+
+def test_finished_jobs_are_not_joined(store):
+    store.join_or_create("a", "key", status="pending")
+    store.update("a", status="completed")
+    assert store.join_or_create("b", "key", status="pending") == "b"
+
+def test_detach_counts_subscribers_down(store):
+    store.join_or_create("a", "key", status="pending")
+    store.join_or_create("b", "key", status="pending")
+    assert store.detach("a") == 1
+    assert store.detach("a") == 0
+    assert store.detach("a") == 0
+    assert store.detach("missing") == 0
+
+def test_new_jobs_are_leased_to_this_process(store):
+    before = time.time()
+    store.join_or_create("a", "key", status="pending")
+    job = store.get("a")
+    assert job["owner"] == store.owner
+    assert job["lease_expires_at"] >= before + store.lease_seconds
+
+def test_job_with_expired_lease_is_failed_instead_of_joined(store):
+    store.join_or_create("a", "key", status="pending")
+    store.update("a", lease_expires_at=time.time() - 1)
+    assert store.join_or_create("b", "key", status="pending") == "b"
+    assert store.get("a")["status"] == "failed"
+    assert store.get("a")["result"] == STALE_JOB_MESSAGE
+
+def test_job_of_a_dead_process_is_failed_instead_of_joined(store):
+    store.join_or_create("a", "key", status="running")
+    store.update("a", owner=dead_owner())
+    assert store.join_or_create("b", "key", status="pending") == "b"
+    assert store.get("a")["status"] == "failed"
+
+def test_renew_leases_extends_only_own_unfinished_jobs(store):
+    for job_id in ("mine", "done", "other"):
+        store.join_or_create(job_id, job_id, status="pending")
+        store.update(job_id, lease_expires_at=time.time() + 1)
+    store.update("done", status="completed")
+    store.update("other", owner="elsewhere:1")
+    store.renew_leases()
+    assert store.get("mine")["lease_expires_at"] > time.time() + store.lease_seconds - 5
+    assert store.get("done")["lease_expires_at"] < time.time() + 2
+    assert store.get("other")["lease_expires_at"] < time.time() + 2
+
+def test_fail_stale_leaves_live_jobs_alone(store):
+    store.join_or_create("live", "key-1", status="running")
+    store.join_or_create("expired", "key-2", status="pending")
+    store.update("expired", lease_expires_at=time.time() - 1)
+    assert store.fail_stale() == 1
+    assert store.get("live")["status"] == "running"
+    assert store.get("expired")["status"] == "failed"
+
+def test_sqlite_store_fails_abandoned_jobs_on_start(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    SQLiteJobStore(path).join_or_create("a", "key", status="running")
+    store = SQLiteJobStore(path)
+    assert store.get("a")["status"] == "running"
+    store.update("a", owner=dead_owner())
+    assert SQLiteJobStore(path).get("a")["status"] == "failed"
+
+def test_oldest_finished_jobs_are_evicted_beyond_max_jobs(make_store):
+    store = make_store(max_jobs=2)
+    for job_id in ("a", "b", "c"):
+        store.join_or_create(job_id, job_id, status="pending")
+        store.update(job_id, status="completed")
+        time.sleep(0.01)
+    store.join_or_create("d", "d", status="pending")
+    assert store.get("a") is None
+    assert store.get("b") and store.get("c") and store.get("d")
+
+def test_expired_finished_jobs_are_evicted_but_unfinished_kept(make_store):
+    store = make_store(ttl=0)
+    store.join_or_create("done", "key-1", status="pending")
+    store.update("done", status="failed")
+    store.join_or_create("waiting", "key-2", status="pending")
+    store.join_or_create("new", "key-3", status="pending")
+    assert store.get("done") is None
+    assert store.get("waiting")["status"] == "pending"
+
+def test_incomplete_backend_fails_on_instantiation():
+    class PartialStore(JobStore):
+        def get(self, job_id):
+            return None
+    with pytest.raises(TypeError):
+        PartialStore()
+
+def test_progress_flushes_pending_tokens_before_a_new_stage(store):
+    store.join_or_create("a", "key", status="running")
+    progress, written = JobProgress(store, "a"), []
+    update = store.update
+    store.update = lambda job_id, **fields: (written.append(fields), update(job_id, **fields))
+    progress.token("first ")
+    progress.token("second")
+    progress.stage("next")
+    assert {"partial": "first second"} in written
+    assert store.get("a")["stage"] == "next"
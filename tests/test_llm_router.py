@@ -0,0 +1,82 @@
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("langchain_openai")
+
+import httpx
+from llm_router import LLMNode, LLMRouter, RoutedLLM
+from metrics import JobTimings
+
+class FakeMessage:
+    def __init__(self, content: str, usage: dict | None = None):
+        self.content = content
+        self.usage_metadata = usage
+
+class FakeClient:
+    """Stands in for a node's ChatOpenAI client."""
+    def __init__(self, url: str, fail: bool = False):
+        self.url = url
+        self.fail = fail
+        self.calls = []
+
+    def invoke(self, messages, stop=None):
+        self.calls.append((messages, stop))
+        if self.fail:
+            raise httpx.ConnectError("node down")
+        return FakeMessage(f"answer from {self.url}", {"input_tokens": 10, "output_tokens": 3})
+
+    def stream(self, messages, stop=None):
+        self.calls.append((messages, stop))
+        if self.fail:
+            raise httpx.ConnectError("node down")
+        yield FakeMessage("an ")
+        yield FakeMessage("answer")
+        yield FakeMessage("", {"input_tokens": 10, "output_tokens": 2})
+
+def make_node(url: str, fail: bool = False) -> LLMNode:
+    node = LLMNode(url, "model", "key", max_concurrency=1)
+    node.client = node.streaming_client = FakeClient(url, fail)
+    return node
+
+def test_call_fails_over_to_a_healthy_node():
+    down, up = make_node("http://down"), make_node("http://up")
+    down.client.fail = True
+    down.latency, up.latency = 0.1, 0.2
+    router = LLMRouter([down, up], health_check_interval=0)
+    assert RoutedLLM(router, "model").call("hello") == "answer from http://up"
+    assert not down.healthy and up.healthy
+    assert down.outstanding == up.outstanding == 0
+
+def test_call_gives_up_after_max_attempts():
+    nodes = [make_node("http://a", fail=True), make_node("http://b", fail=True)]
+    router = LLMRouter(nodes, max_attempts=2, health_check_interval=0)
+    with pytest.raises(httpx.ConnectError):
+        RoutedLLM(router, "model").call("hello")
+    assert all(node.outstanding == 0 for node in nodes)
+
+def test_streamed_tokens_reach_on_token_and_usage_reaches_timings():
+    node = make_node("http://a")
+    tokens, timings = [], JobTimings("single")
+    llm = RoutedLLM(LLMRouter([node], health_check_interval=0), "model", on_token=tokens.append)
+    with timings.activate():
+        timings.stage("analyst")
+        assert llm.call([{"role": "user", "content": "hello"}]) == "an answer"
+    assert tokens == ["an ", "answer"]
+    assert timings.llm["analyst"]["calls"] == 1
+    assert timings.llm["analyst"]["prompt_tokens"] == 10
+    assert timings.llm["analyst"]["completion_tokens"] == 2
+
+def test_string_prompts_are_sent_as_a_user_message():
+    node = make_node("http://a")
+    RoutedLLM(LLMRouter([node], health_check_interval=0), "model").call("hello")
+    messages, _ = node.client.calls[0]
+    assert messages == [{"role": "user", "content": "hello"}]
+
+def test_answer_marker_streams_only_the_final_answer():
+    node = make_node("http://a")
+    replies = iter([FakeMessage("Thought: I now can give "), FakeMessage("a great answer\nFinal Ans"), FakeMessage("wer: ### Wallet"), FakeMessage(" Profile")])
+    node.streaming_client.stream = lambda messages, stop=None: replies
+    tokens = []
+    llm = RoutedLLM(LLMRouter([node], health_check_interval=0), "model", on_token=tokens.append, answer_marker="Final Answer:")
+    assert llm.call("hello").endswith("### Wallet Profile")
+    assert tokens == ["### Wallet", " Profile"]
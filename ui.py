@@ -12,17 +12,17 @@ API_BASE_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
 
 # --- Helper Functions to Interact with the API ---
 
-def start_analysis_job(input_data: dict):
+def start_analysis_job(input_data: dict, endpoint: str = "/start_job"):
     """Sends a request to the backend to start a new analysis job."""
     payload = {"input_data": input_data}
     
     # ✨ DEBUGGING: Print the exact payload being sent to the terminal
     st.write("---")
-    st.write(f"**Debug Info:** Sending the following payload to `{API_BASE_URL}/start_job`")
+    st.write(f"**Debug Info:** Sending the following payload to `{API_BASE_URL}{endpoint}`")
     st.code(json.dumps(payload, indent=2), language="json")
     
     try:
-        response = requests.post(f"{API_BASE_URL}/start_job", json=payload)
+        response = requests.post(f"{API_BASE_URL}{endpoint}", json=payload)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -42,13 +42,82 @@ def get_job_status(job_id: str):
         st.error(f"Failed to get job status. Error: {e}")
         return None
 
+def stream_job_events(job_id: str):
+    """Yields (event, data) pairs from the backend's Server-Sent Events stream for a job."""
+    # The server sends a keep-alive at least every 15s, so a 60s read timeout means it's gone.
+    with requests.get(f"{API_BASE_URL}/status/stream", params={"job_id": job_id}, stream=True, timeout=(5, 60)) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+
+def poll_job(job_id: str):
+    """Fallback for when the stream is unavailable: polls /status until the job finishes."""
+    while True:
+        status_response = get_job_status(job_id)
+        if not status_response or status_response.get("status") in ("completed", "failed", "cancelled"):
+            return status_response
+        time.sleep(2)
+
+STAGE_LABELS = {
+    "fetching": "Fetching on-chain data from Blockfrost...",
+    "data_collector": "The Data Collector is preparing the wallet data...",
+    "analyst": "The Wallet Analyst is writing the profile...",
+    "security_analyst": "The Security Analyst is reviewing the wallet...",
+    "comparative_analyst": "The Comparative Analyst is comparing the wallets...",
+    "fast_report": "Writing the profile and security sections in parallel...",
+    "wallet_profiles": "Profiling each wallet in the batch...",
+}
+
+def follow_job(job_id: str, label: str, analyzed_wallet: str):
+    """Shows a job's stages and report text live as they stream in, then stores the outcome."""
+    status_box, live_box, wallets_box = st.empty(), st.empty(), st.container()
+    live_text, final = "", None
+    try:
+        for event, data in stream_job_events(job_id):
+            if event == "status":
+                live_text = ""
+                live_box.empty()
+                if data["status"] == "pending" and data.get("queue_position"):
+                    status_box.info(f"Queued at position {data['queue_position']}, starting in about {data['eta_seconds']:.0f}s...")
+                elif data.get("stage"):
+                    status_box.info(STAGE_LABELS.get(data["stage"], f"Working: {data['stage']}..."))
+            elif event == "token":
+                live_text += data["text"]
+                live_box.markdown(live_text)
+            elif event == "wallet":
+                with wallets_box.expander(f"Profile ready: {data['address']}"):
+                    st.markdown(data["result"])
+            elif event == "done":
+                final = data
+    except requests.exceptions.RequestException as e:
+        status_box.warning(f"Live progress is unavailable ({e}), waiting for the result instead...")
+    if final is None:
+        with st.spinner(f"The AI agents are still working on the {label.lower()}..."):
+            final = poll_job(job_id)
+    status_box.empty(); live_box.empty()
+    if not final:
+        return
+    status = final.get("status")
+    if status == "completed":
+        st.success(f"{label} Complete!")
+        st.session_state.update(last_result=final.get("result"), last_log=final.get("log"), analyzed_wallet=analyzed_wallet)
+    elif status == "failed":
+        st.error(f"{label} failed: {final.get('result')}")
+        st.session_state.update(last_log=final.get('log'))
+    elif status == "cancelled":
+        st.warning(f"{label} was cancelled.")
+
 # --- Streamlit UI Layout ---
 st.set_page_config(page_title="Veritas AI", layout="wide")
 
 st.title("Veritas AI 🤖")
 st.markdown("An AI-Powered On-Chain Analyst for the Cardano Ecosystem. Choose your analysis mode below.")
 
-tab1, tab2 = st.tabs(["👤 Single Wallet Analysis", "⚔️ Wallet Duel"])
+tab1, tab2, tab3 = st.tabs(["👤 Single Wallet Analysis", "⚔️ Wallet Duel", "📊 Portfolio Batch"])
 
 with tab1:
     st.subheader("Profile a single wallet for activity and security insights.")
@@ -67,6 +136,8 @@ with tab1:
                 pass
 
     wallet_address_input = st.text_input("Enter Cardano wallet address (preprod)", key="wallet_input", placeholder="addr_test1...")
+    fast_mode = st.checkbox("Fast mode", help="Generate the profile and security sections in parallel with one LLM call each, instead of the three-agent crew.", key="fast_mode")
+    deep_mode = st.checkbox("Deep mode", help="Analyze the wallet's full transaction history and every asset it holds. The first run on a large wallet takes longer while its history is indexed.", key="deep_mode")
     analyze_button = st.button("Analyze Wallet", type="primary", key="analyze_single")
 
     if analyze_button and wallet_address_input:
@@ -74,24 +145,10 @@ with tab1:
         st.session_state.pop('last_log', None)
         st.session_state.pop('analyzed_wallet', None)
         
-        job_response = start_analysis_job({"wallet_address_1": wallet_address_input, "wallet_address_2": None})
+        job_response = start_analysis_job({"wallet_address_1": wallet_address_input, "wallet_address_2": None, "fast_mode": fast_mode, "deep_mode": deep_mode})
         
         if job_response and job_response.get("job_id"):
-            job_id = job_response["job_id"]
-            with st.spinner("The AI agents are analyzing the wallet... This may take a minute."):
-                while True:
-                    status_response = get_job_status(job_id)
-                    if not status_response: break
-                    status = status_response.get("status")
-                    if status == "completed":
-                        st.success("Analysis Complete!")
-                        st.session_state.update(last_result=status_response.get("result"), last_log=status_response.get("log"), analyzed_wallet=wallet_address_input)
-                        break
-                    elif status == "failed":
-                        st.error(f"Analysis failed: {status_response.get('result')}")
-                        st.session_state.update(last_log=status_response.get('log'))
-                        break
-                    time.sleep(2)
+            follow_job(job_response["job_id"], "Analysis", wallet_address_input)
 
 with tab2:
     st.subheader("Compare two wallets to see how they stack up.")
@@ -111,21 +168,24 @@ with tab2:
         job_response = start_analysis_job({"wallet_address_1": wallet_1_duel, "wallet_address_2": wallet_2_duel})
         
         if job_response and job_response.get("job_id"):
-            job_id = job_response["job_id"]
-            with st.spinner("The AI agent is comparing the wallets... This may take a minute."):
-                while True:
-                    status_response = get_job_status(job_id)
-                    if not status_response: break
-                    status = status_response.get("status")
-                    if status == "completed":
-                        st.success("Comparison Complete!")
-                        st.session_state.update(last_result=status_response.get("result"), last_log=status_response.get("log"), analyzed_wallet="duel_report")
-                        break
-                    elif status == "failed":
-                        st.error(f"Comparison failed: {status_response.get('result')}")
-                        st.session_state.update(last_log=status_response.get('log'))
-                        break
-                    time.sleep(2)
+            follow_job(job_response["job_id"], "Comparison", "duel_report")
+
+with tab3:
+    st.subheader("Profile a batch of wallets and compare them all.")
+    batch_input = st.text_area("Enter one Cardano wallet address per line", placeholder="\n".join(example_wallets.values()), key="batch_input")
+    batch_deep_mode = st.checkbox("Deep mode", help="Analyze each wallet's full transaction history and every asset it holds.", key="batch_deep_mode")
+    batch_button = st.button("Analyze Batch", type="primary", key="analyze_batch")
+
+    batch_addresses = [line.strip() for line in batch_input.splitlines() if line.strip()]
+    if batch_button and batch_addresses:
+        st.session_state.pop('last_result', None)
+        st.session_state.pop('last_log', None)
+        st.session_state.pop('analyzed_wallet', None)
+
+        job_response = start_analysis_job({"wallet_addresses": batch_addresses, "deep_mode": batch_deep_mode}, endpoint="/start_batch_job")
+
+        if job_response and job_response.get("job_id"):
+            follow_job(job_response["job_id"], "Batch Analysis", "batch_report")
 
 if 'last_result' in st.session_state and st.session_state['last_result']:
     st.subheader("Analysis Result")
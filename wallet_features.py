@@ -0,0 +1,146 @@
+import time
+from datetime import datetime, timezone
+from collections import Counter
+import numpy as np
+
+LOVELACE_PER_ADA = 1_000_000
+# Policy ids are the first 56 hex characters (28 bytes) of an asset unit.
+POLICY_ID_LENGTH = 56
+# Windows are anchored at the latest transaction rather than "now", so the
+# summary (and therefore the report cache key) only changes when the wallet does.
+ACTIVITY_WINDOWS = {"24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+BURST_WINDOW_SECONDS = 3600
+BURST_MIN_TXS = 5
+TOP_POLICIES = 5
+
+def compute_wallet_features(address: str, block_times: np.ndarray, assets: list[dict], tx_utxos: list[dict]) -> dict:
+    """Turns raw Blockfrost responses into a compact, deterministic feature summary.
+
+    Nothing in it depends on the current time; see with_recency for the figures that do.
+
+    Args:
+        address: The wallet address the history and UTxOs belong to
+        block_times: Block times of the address's transactions (any order)
+        assets: /accounts/{stake}/addresses/assets entries
+        tx_utxos: /txs/{hash}/utxos responses for (a subset of) the history
+    """
+    return {
+        "activity": activity_features(block_times),
+        "ada_flows": flow_features(address, tx_utxos),
+        "assets": asset_features(assets),
+    }
+
+def block_times_of(history: list[dict]) -> np.ndarray:
+    """Extracts block times from /addresses/{address}/transactions entries."""
+    return np.fromiter((tx["block_time"] for tx in history), dtype=np.int64, count=len(history))
+
+def with_recency(features: dict, now: float | None = None) -> dict:
+    """Returns a copy of a feature summary with activity.days_since_last_tx added.
+
+    It changes with the clock rather than the wallet, so it is added only when a
+    prompt is built and never becomes part of a report cache key.
+    """
+    activity = dict(features["activity"])
+    if "last_tx_at" in activity:
+        last_tx_time = datetime.fromisoformat(activity["last_tx_at"]).timestamp()
+        activity["days_since_last_tx"] = int(((time.time() if now is None else now) - last_tx_time) // 86400)
+    return {**features, "activity": activity}
+
+def activity_features(block_times: np.ndarray) -> dict:
+    times = np.sort(np.asarray(block_times, dtype=np.int64))
+    if times.size == 0:
+        return {"transactions_analyzed": 0}
+    latest = times[-1]
+    features = {
+        "transactions_analyzed": int(times.size),
+        "last_tx_at": datetime.fromtimestamp(int(latest), timezone.utc).isoformat(),
+        "active_span_days": round(float(latest - times[0]) / 86400, 1),
+    }
+    features.update({f"txs_in_{name}_before_last_tx": int(np.count_nonzero(times > latest - seconds)) for name, seconds in ACTIVITY_WINDOWS.items()})
+    if times.size > 1:
+        intervals = np.diff(times) / 3600
+        features["interval_hours"] = {
+            "mean": round(float(intervals.mean()), 2),
+            "median": round(float(np.median(intervals)), 2),
+            "min": round(float(intervals.min()), 2),
+            "std": round(float(intervals.std()), 2),
+        }
+    # For each tx, how many txs fall in the window starting at it.
+    window_counts = np.searchsorted(times, times + BURST_WINDOW_SECONDS, side="right") - np.arange(times.size)
+    burst_starts = window_counts >= BURST_MIN_TXS
+    features["bursts"] = {
+        "max_txs_in_1h": int(window_counts.max()),
+        "burst_detected": bool(burst_starts.any()),
+        "txs_in_bursts": int(np.count_nonzero(_covered_by_bursts(times, burst_starts))),
+    }
+    return features
+
+def _covered_by_bursts(times: np.ndarray, burst_starts: np.ndarray) -> np.ndarray:
+    # A tx is part of a burst if it lies within BURST_WINDOW_SECONDS after any burst start.
+    if not burst_starts.any():
+        return np.zeros(times.size, dtype=bool)
+    starts = times[burst_starts]
+    nearest = np.searchsorted(starts, times, side="right") - 1
+    return (nearest >= 0) & (times - starts[np.clip(nearest, 0, None)] <= BURST_WINDOW_SECONDS)
+
+def compact_features(features: dict) -> dict:
+    """Flattens a feature summary to the few figures used when comparing many wallets."""
+    activity, flows, assets = features["activity"], features["ada_flows"], features["assets"]
+    return {
+        "txs": activity["transactions_analyzed"],
+        "days_since_last_tx": activity.get("days_since_last_tx"),
+        "txs_7d": activity.get("txs_in_7d_before_last_tx", 0),
+        "max_txs_in_1h": activity.get("bursts", {}).get("max_txs_in_1h", 0),
+        "ada_in": flows.get("ada_in", 0.0),
+        "ada_out": flows.get("ada_out", 0.0),
+        "asset_classes": assets["total_asset_classes"],
+        "policies": assets["policies"],
+        "lone_unit_ratio": assets["lone_unit_ratio"],
+    }
+
+def flow_features(address: str, tx_utxos: list[dict]) -> dict:
+    if not tx_utxos:
+        return {"transactions_with_flow_data": 0}
+    received = np.array([_lovelace(utxos["outputs"], address) for utxos in tx_utxos], dtype=np.int64)
+    sent = np.array([_lovelace(utxos["inputs"], address) for utxos in tx_utxos], dtype=np.int64)
+    net = received - sent
+    return {
+        "transactions_with_flow_data": len(tx_utxos),
+        "ada_in": _ada(received.sum()),
+        "ada_out": _ada(sent.sum()),
+        "ada_net": _ada(net.sum()),
+        "largest_inflow": _ada(max(int(net.max()), 0)),
+        "largest_outflow": _ada(max(int(-net.min()), 0)),
+        "incoming_txs": int(np.count_nonzero(net > 0)),
+        "outgoing_txs": int(np.count_nonzero(net < 0)),
+    }
+
+def _lovelace(entries: list[dict], address: str) -> int:
+    # Reference inputs are only read, and collateral inputs and the collateral return
+    # output only take effect if a script fails, so none of them move ADA in a valid tx.
+    return sum(int(amount["quantity"]) for entry in entries if entry["address"] == address and not entry.get("reference") and not entry.get("collateral") for amount in entry["amount"] if amount["unit"] == "lovelace")
+
+def _ada(lovelace) -> float:
+    return round(int(lovelace) / LOVELACE_PER_ADA, 2)
+
+def asset_features(assets: list[dict]) -> dict:
+    if not assets:
+        return {"total_asset_classes": 0, "policies": 0, "lone_unit_ratio": 0.0}
+    per_policy = Counter(asset["unit"][:POLICY_ID_LENGTH] for asset in assets)
+    counts = np.fromiter(per_policy.values(), dtype=np.int64, count=len(per_policy))
+    quantities = np.array([int(asset["quantity"]) for asset in assets], dtype=object)
+    # Lone units: a single unit that is the only asset held from its policy. That is
+    # the shape of unsolicited airdrops and spam tokens, but also of any one-off NFT,
+    # so it is reported as a shape rather than as dust.
+    singleton = np.array([per_policy[asset["unit"][:POLICY_ID_LENGTH]] == 1 for asset in assets])
+    lone_units = singleton & (quantities == 1).astype(bool)
+    return {
+        "total_asset_classes": len(assets),
+        "policies": len(per_policy),
+        "assets_per_policy": {"mean": round(float(counts.mean()), 2), "median": float(np.median(counts)), "max": int(counts.max())},
+        "single_asset_policies": int(np.count_nonzero(counts == 1)),
+        "top_policies": dict(per_policy.most_common(TOP_POLICIES)),
+        "fungible_asset_classes": int(np.count_nonzero(quantities > 1)),
+        "lone_unit_asset_classes": int(np.count_nonzero(lone_units)),
+        "lone_unit_ratio": round(float(np.count_nonzero(lone_units)) / len(assets), 3),
+    }
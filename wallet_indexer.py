@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+import numpy as np
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_PATH = os.environ.get("WALLET_INDEX_PATH", os.path.join("data", "wallet_index.sqlite3"))
+
+class WalletIndexer:
+    """Local, incrementally synced index of full address transaction histories.
+
+    Each indexed address remembers the highest block it has seen. A sync asks
+    Blockfrost only for transactions from that block on, so re-analysing a large
+    wallet costs a page or two of requests instead of its whole history.
+    Transactions are stored compactly: 32-byte hashes plus integer block columns,
+    in a WITHOUT ROWID table clustered by address and block, so one address's
+    history reads back as contiguous columns.
+    """
+    def __init__(self, path: str = INDEX_PATH):
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS addresses (
+                address_id INTEGER PRIMARY KEY,
+                network TEXT NOT NULL,
+                address TEXT NOT NULL,
+                last_block_height INTEGER,
+                synced_at REAL,
+                UNIQUE (network, address)
+            );
+            CREATE TABLE IF NOT EXISTS txs (
+                address_id INTEGER NOT NULL,
+                block_height INTEGER NOT NULL,
+                tx_index INTEGER NOT NULL,
+                block_time INTEGER NOT NULL,
+                tx_hash BLOB NOT NULL,
+                PRIMARY KEY (address_id, block_height, tx_index)
+            ) WITHOUT ROWID;
+        """)
+
+    async def sync(self, client, network: str, address: str) -> int:
+        """Brings an address's history up to date and returns how many txs were new."""
+        address_id, last_block_height = self._address_row(network, address)
+        params = {"order": "asc"}
+        if last_block_height is not None:
+            # `from` is inclusive, so the last block is re-read; its txs are ignored as duplicates.
+            params["from"] = str(last_block_height)
+        added = 0
+
+        def store_page(page: int, page_items: list):
+            nonlocal added
+            added += self._insert(address_id, page_items)
+
+        started = time.monotonic()
+        # Catching up an indexed address is usually a single page, so don't speculate.
+        concurrency = 1 if last_block_height is not None else None
+        await client.get_all_pages(f"/addresses/{address}/transactions", params=params, concurrency=concurrency, on_page=store_page)
+        with self._lock:
+            self._db.execute("UPDATE addresses SET last_block_height = (SELECT MAX(block_height) FROM txs WHERE address_id = ?), synced_at = ? WHERE address_id = ?", (address_id, time.time(), address_id))
+        logger.info(f"Indexed {added} new txs for {address} in {time.monotonic() - started:.1f}s")
+        return added
+
+    async def sync_stake_account(self, client, network: str, stake_address: str) -> int:
+        """Syncs every address that belongs to a stake key."""
+        addresses = await client.get_all_pages(f"/accounts/{stake_address}/addresses")
+        added = 0
+        for entry in addresses:
+            added += await self.sync(client, network, entry["address"])
+        return added
+
+    def is_indexed(self, network: str, address: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT synced_at FROM addresses WHERE network = ? AND address = ?", (network, address)).fetchone()
+        return row is not None and row[0] is not None
+
+    def block_times(self, network: str, address: str) -> np.ndarray:
+        """Returns the block times of every indexed tx for an address, oldest first."""
+        with self._lock:
+            rows = self._db.execute("SELECT block_time FROM txs JOIN addresses USING (address_id) WHERE network = ? AND address = ? ORDER BY block_height, tx_index", (network, address)).fetchall()
+        return np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+
+    def latest_tx_hashes(self, network: str, address: str, limit: int) -> list[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT tx_hash FROM txs JOIN addresses USING (address_id) WHERE network = ? AND address = ? ORDER BY block_height DESC, tx_index DESC LIMIT ?", (network, address, limit)).fetchall()
+        return [row[0].hex() for row in rows]
+
+    def _address_row(self, network: str, address: str) -> tuple[int, int | None]:
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO addresses (network, address) VALUES (?, ?)", (network, address))
+            return self._db.execute("SELECT address_id, last_block_height FROM addresses WHERE network = ? AND address = ?", (network, address)).fetchone()
+
+    def _insert(self, address_id: int, page_items: list) -> int:
+        rows = [(address_id, tx["block_height"], tx["tx_index"], tx["block_time"], bytes.fromhex(tx["tx_hash"])) for tx in page_items]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO txs (address_id, block_height, tx_index, block_time, tx_hash) VALUES (?, ?, ?, ?, ?)", rows)
+            return self._db.total_changes - before
+
+_indexer: WalletIndexer | None = None
+_indexer_lock = threading.Lock()
+
+def get_indexer() -> WalletIndexer:
+    """Returns the process-wide wallet indexer."""
+    global _indexer
+    with _indexer_lock:
+        if _indexer is None:
+            _indexer = WalletIndexer()
+        return _indexer
+
+if __name__ == "__main__":
+    # Pre-warm the index for a large wallet: python wallet_indexer.py <address or stake key>
+    from dotenv import load_dotenv
+    load_dotenv()
+    from blockfrost_client import CARDANO_NETWORK, get_client, run_sync
+    target = sys.argv[1]
+    indexer = get_indexer()
+    if target.startswith("stake"):
+        added = run_sync(indexer.sync_stake_account(get_client(), CARDANO_NETWORK, target))
+    else:
+        added = run_sync(indexer.sync(get_client(), CARDANO_NETWORK, target))
+    print(f"Indexed {added} new transactions for {target}.")